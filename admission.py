@@ -0,0 +1,122 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+import settings
+
+
+class Overloaded(Exception):
+    """Raised when a gate is full; carries the Retry-After hint in seconds."""
+
+    def __init__(self, gate: str, retry_after: int):
+        super().__init__(f"{gate} is at capacity")
+        self.gate = gate
+        self.retry_after = retry_after
+
+
+class Gate:
+    """
+    Bounded admission for one kind of heavy work, per worker.
+
+    At most `max_concurrent` callers run at once and at most `max_queue` wait in
+    FIFO order; anyone beyond that, or anyone who waits longer than
+    `queue_timeout_seconds`, is turned away with Overloaded. Limits come from the
+    `admission` setting and are re-read on every request. Runs on the event loop
+    only, so no locking is needed.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._active = 0
+        self._waiters = deque()
+        self._stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "max_waiting": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_run_ms": 0.0,
+        }
+
+    def policy(self) -> dict:
+        configured = (settings.load_settings().get("admission") or {}).get(self.name) or {}
+        return {**settings.DEFAULT_SETTINGS["admission"][self.name], **configured}
+
+    def _retry_after(self, policy: dict) -> int:
+        # Rough time until the current backlog drains, never below the configured floor
+        admitted = self._stats["admitted"] or 1
+        avg_run_s = self._stats["total_run_ms"] / admitted / 1000
+        backlog = (len(self._waiters) + 1) / max(policy["max_concurrent"], 1)
+        return max(policy["retry_after_seconds"], math.ceil(avg_run_s * backlog))
+
+    def _release(self):
+        # Hand the slot straight to the next live waiter so it can't be stolen
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def _acquire(self, policy: dict):
+        if self._active < policy["max_concurrent"] and not self._waiters:
+            self._active += 1
+            return
+
+        if len(self._waiters) >= policy["max_queue"]:
+            self._stats["rejected"] += 1
+            raise Overloaded(self.name, self._retry_after(policy))
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["max_waiting"] = max(self._stats["max_waiting"], len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), policy["queue_timeout_seconds"])
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived as we gave up; pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._stats["timed_out"] += 1
+                raise Overloaded(self.name, self._retry_after(policy)) from None
+            raise
+
+    @asynccontextmanager
+    async def admit(self):
+        policy = self.policy()
+        queued_at = time.perf_counter()
+        await self._acquire(policy)
+
+        started = time.perf_counter()
+        waited_ms = (started - queued_at) * 1000
+        self._stats["admitted"] += 1
+        self._stats["total_wait_ms"] += waited_ms
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+        try:
+            yield waited_ms
+        finally:
+            self._stats["total_run_ms"] += (time.perf_counter() - started) * 1000
+            self._release()
+
+    def metrics(self) -> dict:
+        snapshot = {"active": self._active, "waiting": len(self._waiters), **self.policy(), **self._stats}
+        admitted = snapshot["admitted"] or 1
+        snapshot["avg_wait_ms"] = round(snapshot["total_wait_ms"] / admitted, 3)
+        snapshot["avg_run_ms"] = round(snapshot["total_run_ms"] / admitted, 3)
+        for key in ("total_wait_ms", "max_wait_ms", "total_run_ms"):
+            snapshot[key] = round(snapshot[key], 3)
+        return snapshot
+
+
+# --- Gates ---
+generate_gate = Gate("generate")
+
+
+def metrics() -> dict:
+    return {gate.name: gate.metrics() for gate in (generate_gate,)}
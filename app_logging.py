@@ -0,0 +1,154 @@
+import re
+import sys
+import time
+import queue
+import random
+import logging
+import traceback
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+import settings
+
+# --- Constants ---
+QUEUE_SIZE = 10000
+MAX_FIELD_CHARS = 200
+MAX_LIST_ITEMS = 20
+MAX_EXC_CHARS = 4000
+
+# Payload keys whose values may be logged as-is; everything else is reduced to its size
+LOGGABLE_PAYLOAD_FIELDS = {"dateOfEvaluation", "provider", "location"}
+# Share paths and note file names are built from patient names
+PATH_PATTERN = re.compile(
+    r"""(['"])[^'"\n]*(?:[\\/]|\.docx|\.pdf)[^'"\n]*\1"""
+    r"""|[^\s'"]*[\\/][^'"\n]*|[^\s'"]+\.(?:docx|pdf)\b""",
+    re.IGNORECASE,
+)
+
+logger = logging.getLogger("prc")
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_listener = None
+dropped = 0
+
+
+# --- Field Helpers ---
+def redact_payload(data: dict) -> dict:
+    """Keep the shape of a payload without its patient content."""
+    redacted = {}
+    for key, value in data.items():
+        if key in LOGGABLE_PAYLOAD_FIELDS:
+            redacted[key] = value
+        elif isinstance(value, (dict, list)):
+            redacted[key] = f"<redacted {type(value).__name__}:{len(value)}>"
+        elif value in (None, ""):
+            redacted[key] = value
+        else:
+            redacted[key] = f"<redacted:{len(str(value))}>"
+    return redacted
+
+
+def redact_paths(text: str) -> str:
+    return PATH_PATTERN.sub("<path>", text)
+
+
+def error_text(error: BaseException) -> str:
+    """Exception type and message without file paths, for logs, job events and error responses."""
+    message = error.strerror if isinstance(error, OSError) and error.strerror else str(error)
+    message = redact_paths(message)
+    return f"{type(error).__name__}: {message}" if message else type(error).__name__
+
+
+def _cap(value):
+    if isinstance(value, str):
+        return value if len(value) <= MAX_FIELD_CHARS else f"{value[:MAX_FIELD_CHARS]}…(+{len(value) - MAX_FIELD_CHARS})"
+    if isinstance(value, dict):
+        return {k: _cap(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        capped = [_cap(v) for v in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            capped.append(f"…(+{len(value) - MAX_LIST_ITEMS})")
+        return capped
+    return value
+
+
+# --- Handlers ---
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; runs on the writer thread."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route:
+            entry["route"] = route
+        entry.update(_cap(getattr(record, "fields", {})))
+        if record.exc_info:
+            # Frames as usual; the message goes through error_text so paths stay out of the log
+            _, error, tb = record.exc_info
+            entry["exc"] = ("".join(traceback.format_tb(tb)) + error_text(error))[-MAX_EXC_CHARS:]
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RouteSampler(logging.Filter):
+    """Per-route sampling from the `log_sampling` setting; warnings and errors are always kept."""
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = settings.load_settings().get("log_sampling", {}).get(getattr(record, "route", None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # Enqueue the raw record; formatting happens on the listener thread, not in the request
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        global dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped += 1
+
+
+_handler = _DeferredQueueHandler(_queue)
+_handler.addFilter(RouteSampler())
+logger.addHandler(_handler)
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+
+# --- Public API ---
+def log_event(event: str, route: str | None = None, level: int = logging.INFO, exc_info=None, **fields):
+    logger.log(level, event, exc_info=exc_info, extra={"route": route, "fields": fields})
+
+
+def start():
+    global _listener
+    if _listener is not None:
+        return
+    writer = logging.StreamHandler(sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _listener = QueueListener(_queue, writer, respect_handler_level=False)
+    _listener.start()
+
+
+def stop():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def timer():
+    """Start a monotonic timer; pass the result to elapsed_ms()."""
+    return time.perf_counter()
+
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
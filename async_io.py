@@ -0,0 +1,73 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Constants ---
+IO_WORKERS = int(os.environ.get("IO_WORKERS", "8"))
+
+_executor = None
+_lock = threading.Lock()
+_stats = {
+    "workers": IO_WORKERS,
+    "queued": 0,
+    "active": 0,
+    "max_queued": 0,
+    "completed": 0,
+    "failed": 0,
+    "total_wait_ms": 0.0,
+    "max_wait_ms": 0.0,
+}
+
+
+def _tracked(func, args, kwargs, submitted_at):
+    waited_ms = (time.perf_counter() - submitted_at) * 1000
+    with _lock:
+        _stats["queued"] -= 1
+        _stats["active"] += 1
+        _stats["total_wait_ms"] += waited_ms
+        _stats["max_wait_ms"] = max(_stats["max_wait_ms"], waited_ms)
+    try:
+        result = func(*args, **kwargs)
+    except BaseException:
+        with _lock:
+            _stats["failed"] += 1
+        raise
+    finally:
+        with _lock:
+            _stats["active"] -= 1
+            _stats["completed"] += 1
+    return result
+
+
+async def run_io(func, *args, **kwargs):
+    """Run blocking filesystem work on the bounded disk pool instead of the event loop."""
+    global _executor
+    with _lock:
+        # Created on first use, and again after shutdown() when the app's lifespan runs twice
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="disk-io")
+        executor = _executor
+        _stats["queued"] += 1
+        _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _tracked, func, args, kwargs, time.perf_counter())
+
+
+def metrics() -> dict:
+    with _lock:
+        snapshot = dict(_stats)
+    done = snapshot["completed"] or 1
+    snapshot["avg_wait_ms"] = round(snapshot["total_wait_ms"] / done, 3)
+    snapshot["total_wait_ms"] = round(snapshot["total_wait_ms"], 3)
+    snapshot["max_wait_ms"] = round(snapshot["max_wait_ms"], 3)
+    return snapshot
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
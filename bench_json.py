@@ -0,0 +1,76 @@
+"""
+Micro-benchmark: stdlib json vs orjson on realistic request/response bodies.
+
+    python bench_json.py [iterations]
+"""
+import json
+import sys
+import timeit
+
+import orjson
+
+from payload_models import FollowUpPayload
+
+
+def follow_up_payload() -> dict:
+    with open("templates/Template.json", "r") as f:
+        template = json.load(f)
+
+    qualitative = template["pain_characteristics"]["qualitative"]
+    payload = {
+        name: f"{name} - Patient reports symptoms are stable since the last visit, no new complaints."
+        for name in FollowUpPayload.model_fields
+        if name not in ("docSections", "signature", "templateId")
+    }
+    payload.update({
+        "patientName": "Doe, John",
+        "dateOfEvaluation": "09/06/2025",
+        "fileName": "Doe John 09-06-2025",
+        "physician": "Robert Klickovich, M.D",
+        "qualitativePain": ", ".join(qualitative),
+        "docSections": [
+            {"heading": f"Section {i}", "lines": [f"{q} pain at L4-L5, right > left" for q in qualitative]}
+            for i in range(6)
+        ],
+        "signature": {
+            "otherPlans": "\n".join(f"{i}. Continue home exercise program" for i in range(1, 8)),
+            "formattedLines": "Bilateral L4-L5 RFA scheduled\nCaudal ESI pending authorization",
+            "followUpAppointment": "Follow up in 4 weeks",
+            "signatureLine": "Robert Klickovich, M.D",
+            "dateTranscribed": "09/07/2025",
+        },
+    })
+    return payload
+
+
+def physicians() -> list:
+    with open("data/physicians.json", "r") as f:
+        return json.load(f)
+
+
+def bench(label: str, func, number: int):
+    seconds = timeit.timeit(func, number=number)
+    per_call_us = seconds / number * 1_000_000
+    print(f"  {label:<28} {per_call_us:9.2f} µs")
+    return per_call_us
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    cases = {"follow-up payload": follow_up_payload(), "physician list": physicians()}
+
+    for name, obj in cases.items():
+        raw = json.dumps(obj).encode()
+        print(f"{name} ({len(raw):,} bytes, {number} iterations)")
+
+        stdlib_parse = bench("json.loads", lambda: json.loads(raw), number)
+        orjson_parse = bench("orjson.loads", lambda: orjson.loads(raw), number)
+        stdlib_dump = bench("json.dumps().encode()", lambda: json.dumps(obj).encode(), number)
+        orjson_dump = bench("orjson.dumps", lambda: orjson.dumps(obj), number)
+
+        print(f"  parse speed-up: {stdlib_parse / orjson_parse:.1f}x, "
+              f"serialize speed-up: {stdlib_dump / orjson_dump:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
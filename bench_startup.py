@@ -0,0 +1,75 @@
+"""
+Startup budget: cold `import main` and the first /generate-doc request.
+
+    python bench_startup.py [runs]
+
+Each measurement runs in a fresh interpreter so nothing is cached in-process.
+Everything the app writes goes to a temp folder (loadtest.sandbox), so the benchmark
+never touches the share or data/.
+"""
+import os
+import sys
+import json
+import tempfile
+import statistics
+import subprocess
+
+IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import main
+print(time.perf_counter() - t)
+"""
+
+FIRST_REQUEST_SNIPPET = """
+import json, sys, time
+t = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+from bench_json import follow_up_payload
+imported = time.perf_counter()
+
+from loadtest import sandbox
+sandbox(sys.argv[1])
+
+client = TestClient(main.app)
+payload = follow_up_payload()
+r = client.post("/generate-doc", json=payload)
+first = time.perf_counter()
+client.post("/generate-doc", json=payload)
+second = time.perf_counter()
+print(json.dumps({"status": r.status_code, "import": imported - t,
+                  "first_request": first - imported, "second_request": second - first}))
+"""
+
+
+def run(snippet: str, env: dict, *args: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", snippet, *args], capture_output=True, text=True, env=env, check=True,
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def report(label: str, seconds: list[float]):
+    ms = [s * 1000 for s in seconds]
+    print(f"  {label:<16} median {statistics.median(ms):8.1f} ms   min {min(ms):8.1f} ms   max {max(ms):8.1f} ms")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    root = tempfile.mkdtemp(prefix="prc-bench-")
+    env = {**os.environ, "PRC_ROOT": os.path.join(root, "prc")}
+
+    imports = [float(run(IMPORT_SNIPPET, env)) for _ in range(runs)]
+    # A fresh sandbox per run, so every first request starts from an empty notes index
+    samples = [json.loads(run(FIRST_REQUEST_SNIPPET, env, tempfile.mkdtemp(dir=root))) for _ in range(runs)]
+
+    print(f"Cold start ({runs} runs)")
+    report("import main", imports)
+    report("first request", [s["first_request"] for s in samples])
+    report("second request", [s["second_request"] for s in samples])
+    print(f"  status codes: {sorted({s['status'] for s in samples})}")
+
+
+if __name__ == "__main__":
+    main()
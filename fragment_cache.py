@@ -0,0 +1,194 @@
+"""
+Section-level render cache for the note body.
+
+docxtpl renders document.xml as one Jinja template, so every note re-compiles and
+re-evaluates all of it. Here the (already patched) body is cut into sections at
+top-level paragraph/table boundaries where no Jinja block is open. Each section
+is compiled once, and its rendered XML is cached under a hash of the section
+source and the values of the variables it uses. Boilerplate, and fields that
+repeat across patients, come straight from the cache. The section source hash
+changes with the template, so a new template version never reuses old fragments.
+"""
+import io
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import orjson
+from docxtpl import DocxTemplate
+from jinja2 import Environment, meta
+
+# --- Constants ---
+MAX_FRAGMENTS = 4096
+MAX_PATCHED_BODIES = 16
+MAX_SECTIONS = 256
+
+TAG_PATTERN = re.compile(r"<(/?)w:(\w+)[^>]*?(/?)>|\{%-?\s*(\w+)")
+BLOCK_TAGS = {"for", "if", "macro", "call", "filter", "with", "block", "raw", "autoescape"}
+# Tags that leak state from one section into the next; templates using them render whole
+STATEFUL_TAGS = {"set", "import", "from", "include", "extends", "macro"}
+
+_default_env = Environment()
+_lock = threading.Lock()
+_sections = OrderedDict()
+_fragments = OrderedDict()
+_patched = OrderedDict()
+_stats = {"renders": 0, "fallbacks": 0, "hits": 0, "misses": 0, "uncacheable": 0}
+# Cleared if the warm-up parity check ever finds a difference from a plain render
+enabled = True
+
+
+# --- Splitting ---
+def split_sections(body_xml: str) -> list[str] | None:
+    """Cut `<w:body>...</w:body>` source into independent sections, or None if it can't be."""
+    cuts = []
+    xml_depth = block_depth = 0
+    for m in TAG_PATTERN.finditer(body_xml):
+        closing, element, self_closing, jinja_tag = m.groups()
+        if jinja_tag:
+            if jinja_tag in STATEFUL_TAGS:
+                return None
+            if jinja_tag in BLOCK_TAGS:
+                block_depth += 1
+            elif jinja_tag.startswith("end"):
+                block_depth -= 1
+            continue
+        if self_closing:
+            if xml_depth == 1 and block_depth == 0:
+                cuts.append(m.end())
+            continue
+        xml_depth += -1 if closing else 1
+        # Back at body level after a paragraph/table closed: a safe boundary
+        if closing and xml_depth == 1 and block_depth == 0:
+            cuts.append(m.end())
+        elif not closing and xml_depth == 1 and element == "body":
+            cuts.append(m.end())
+
+    if block_depth != 0 or not cuts or len(cuts) > MAX_SECTIONS:
+        return None
+    bounds = [0, *cuts, len(body_xml)]
+    return [body_xml[a:b] for a, b in zip(bounds, bounds[1:]) if a != b]
+
+
+# --- Caches ---
+def _lru_get(cache: OrderedDict, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache: OrderedDict, key, value, limit: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def _compiled(env: Environment, source: str):
+    """(template, variable names) for a section, compiled once per process."""
+    key = (id(env), hashlib.sha1(source.encode()).hexdigest())
+    with _lock:
+        entry = _lru_get(_sections, key)
+    if entry is None:
+        variables = tuple(sorted(meta.find_undeclared_variables(env.parse(source))))
+        entry = (key[1], env.from_string(source), variables)
+        with _lock:
+            _lru_put(_sections, key, entry, MAX_SECTIONS * 8)
+    return entry
+
+
+def render_sections(sections: list[str], context: dict, env: Environment) -> str:
+    out = []
+    for source in sections:
+        source_hash, template, variables = _compiled(env, source)
+        try:
+            inputs = orjson.dumps([context.get(name) for name in variables])
+        except TypeError:
+            # RichText, images, etc.: render every time
+            with _lock:
+                _stats["uncacheable"] += 1
+            out.append(template.render(context))
+            continue
+
+        key = hashlib.sha1(source_hash.encode() + inputs).hexdigest()
+        with _lock:
+            fragment = _lru_get(_fragments, key)
+            _stats["hits" if fragment is not None else "misses"] += 1
+        if fragment is None:
+            fragment = template.render(context)
+            with _lock:
+                _lru_put(_fragments, key, fragment, MAX_FRAGMENTS)
+        out.append(fragment)
+    return "".join(out)
+
+
+def metrics() -> dict:
+    with _lock:
+        return {**_stats, "sections": len(_sections), "fragments": len(_fragments), "patched_bodies": len(_patched)}
+
+
+def clear():
+    with _lock:
+        _sections.clear()
+        _fragments.clear()
+        _patched.clear()
+
+
+# --- Template ---
+class CachingDocxTemplate(DocxTemplate):
+    """DocxTemplate whose body renders section by section through the fragment cache."""
+
+    def build_xml(self, context, jinja_env=None):
+        # patch_xml is a pure (and slow) function of the template body; do it once per template version
+        xml = self.get_xml()
+        key = hashlib.sha1(xml.encode()).hexdigest()
+        with _lock:
+            patched = _lru_get(_patched, key)
+        if patched is None:
+            patched = self.patch_xml(xml)
+            with _lock:
+                _lru_put(_patched, key, patched, MAX_PATCHED_BODIES)
+        return self.render_xml_part(patched, self.docx._part, context, jinja_env)
+
+    def render_xml_part(self, src_xml, part, context, jinja_env=None):
+        if part is not self.docx._part:
+            # Headers and footers are small; leave them to docxtpl
+            return super().render_xml_part(src_xml, part, context, jinja_env)
+
+        sections = split_sections(src_xml)
+        with _lock:
+            _stats["renders" if sections else "fallbacks"] += 1
+        if sections is None:
+            return super().render_xml_part(src_xml, part, context, jinja_env)
+
+        self.current_rendering_part = part
+        sections = [re.sub(r"<w:p([ >])", r"\n<w:p\1", section) for section in sections]
+        dst_xml = render_sections(sections, context, jinja_env or _default_env)
+
+        # Same post-processing as DocxTemplate.render_xml_part
+        dst_xml = re.sub(r"\n<w:p([ >])", r"<w:p\1", dst_xml)
+        dst_xml = (
+            dst_xml.replace("{_{", "{{")
+            .replace("}_}", "}}")
+            .replace("{_%", "{%")
+            .replace("%_}", "%}")
+        )
+        return self.resolve_listing(dst_xml)
+
+
+def matches_plain(template_source: str | bytes, context: dict) -> bool:
+    """Render `context` both ways (twice cached, so hits are exercised too) and compare body XML."""
+    def open_source():
+        return io.BytesIO(template_source) if isinstance(template_source, bytes) else template_source
+
+    plain = DocxTemplate(open_source())
+    plain.render(dict(context))
+    expected = plain.get_xml()
+    for _ in range(2):
+        cached = CachingDocxTemplate(open_source())
+        cached.render(dict(context))
+        if cached.get_xml() != expected:
+            return False
+    return True
@@ -0,0 +1,83 @@
+import os
+import uuid
+import asyncio
+
+import async_io
+import settings
+import shared_store
+
+# --- Constants ---
+STORE_SCOPE = "idempotency"
+LEASE_SECONDS = 120
+POLL_SECONDS = 0.1
+
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_inflight = {}
+
+
+class KeyReuseError(Exception):
+    """The Idempotency-Key was already used with a different request body."""
+
+
+def ttl_seconds() -> float:
+    return settings.load_settings()["idempotency_ttl_seconds"]
+
+
+async def _cached(key: str, fingerprint: str):
+    entry = await async_io.run_io(shared_store.get, STORE_SCOPE, key)
+    if entry is None:
+        return None
+    if entry["fingerprint"] != fingerprint:
+        raise KeyReuseError(key)
+    return entry["result"]
+
+
+async def _compute_across_workers(key: str, fingerprint: str, compute):
+    """Run `compute` in exactly one worker; the others wait for its stored result."""
+    lease = f"{STORE_SCOPE}:{key}"
+    while True:
+        result = await _cached(key, fingerprint)
+        if result is not None:
+            return result, True
+
+        if await async_io.run_io(shared_store.acquire_lease, lease, _worker_id, LEASE_SECONDS):
+            try:
+                result = await compute()
+                await async_io.run_io(
+                    shared_store.put, STORE_SCOPE, key,
+                    {"fingerprint": fingerprint, "result": result}, ttl_seconds(),
+                )
+                return result, False
+            finally:
+                await async_io.run_io(shared_store.release_lease, lease, _worker_id)
+
+        await asyncio.sleep(POLL_SECONDS)
+
+
+async def single_flight(key: str, fingerprint: str, compute):
+    """
+    Collapse requests that share an Idempotency-Key.
+
+    Concurrent callers in this process await the same computation; callers in
+    other workers wait on the shared store; later callers within the TTL get the
+    cached result. Returns (result, replayed). `compute` must return JSON-able data.
+    """
+    if key in _inflight:
+        inflight_fingerprint, future = _inflight[key]
+        if inflight_fingerprint != fingerprint:
+            raise KeyReuseError(key)
+        return await asyncio.shield(future), True
+
+    future = asyncio.get_running_loop().create_future()
+    # Mark the exception as retrieved even if nobody else was waiting
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = (fingerprint, future)
+    try:
+        result, replayed = await _compute_across_workers(key, fingerprint, compute)
+        future.set_result(result)
+        return result, replayed
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
@@ -0,0 +1,107 @@
+import re
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+
+import orjson
+
+import async_io
+import shared_store
+from app_logging import error_text, log_event
+
+# --- Constants ---
+# Stages are "<pipeline>.<step>", e.g. generate.rendering or upload.verifying
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+EVENT_TTL_SECONDS = 24 * 3600
+POLL_SECONDS = 0.25
+HEARTBEAT_SECONDS = 15
+STREAM_IDLE_SECONDS = 300
+# A stream for a job nothing was ever recorded for ends after this; clients subscribe just before posting
+PENDING_JOB_SECONDS = 10
+
+
+# --- Job IDs ---
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def job_id_from(value: str | None) -> str:
+    """Use a client-chosen job id when it looks sane so it can subscribe before the job starts."""
+    return value if value and JOB_ID_PATTERN.match(value) else new_job_id()
+
+
+def job_key(scope: str, job_id: str) -> str:
+    """
+    Where a job's events are kept. Job ids can be client-chosen and events name the
+    patient file, so they are stored per session scope, like idempotency keys.
+    """
+    return f"{scope}:{job_id}"
+
+
+def _stream(job: str) -> str:
+    return f"job:{job}"
+
+
+# --- Writing ---
+def emit(job: str | None, stage: str, **detail):
+    """Record a stage transition. Progress reporting must never fail the job itself."""
+    if not job:
+        return
+    try:
+        shared_store.append_event(_stream(job), {"stage": stage, "ts": time.time(), **detail})
+    except sqlite3.Error as e:
+        log_event("job.progress_failed", level=logging.WARNING, stage=stage, error=error_text(e))
+
+
+def is_final(stage: str) -> bool:
+    return stage.endswith((".done", ".failed"))
+
+
+# --- Reading ---
+def events(job: str, after_id: int = 0) -> list[dict]:
+    """Events for a job with elapsed_ms measured from the job's first event."""
+    rows = shared_store.read_events(_stream(job))
+    if not rows:
+        return []
+    started = rows[0][1]["ts"]
+    return [
+        {"id": event_id, **data, "elapsed_ms": round((data["ts"] - started) * 1000, 2)}
+        for event_id, data in rows
+        if event_id > after_id
+    ]
+
+
+def _sse(event: dict) -> bytes:
+    return b"id: %d\ndata: %s\n\n" % (event["id"], orjson.dumps(event))
+
+
+async def sse_stream(job: str, last_event_id: int = 0, follow: bool = False):
+    """
+    Server-Sent Events for one job. Ends after a final stage (*.done / *.failed)
+    unless `follow` is set, e.g. to watch generate and then upload on one job id,
+    and after PENDING_JOB_SECONDS if the job (in this session) never recorded anything.
+    """
+    opened = idle_since = time.monotonic()
+    heartbeat_at = idle_since
+    seen = last_event_id > 0
+    while True:
+        batch = await async_io.run_io(events, job, last_event_id)
+        now = time.monotonic()
+        for event in batch:
+            last_event_id = event["id"]
+            yield _sse(event)
+        if batch:
+            seen = True
+            idle_since = heartbeat_at = now
+            if not follow and is_final(batch[-1]["stage"]):
+                return
+        elif not seen and now - opened >= PENDING_JOB_SECONDS:
+            return
+        elif now - idle_since >= STREAM_IDLE_SECONDS:
+            return
+        elif now - heartbeat_at >= HEARTBEAT_SECONDS:
+            heartbeat_at = now
+            yield b": keep-alive\n\n"
+        await asyncio.sleep(POLL_SECONDS)
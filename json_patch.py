@@ -0,0 +1,110 @@
+import copy
+
+# RFC 6902 JSON Patch over plain dicts/lists (what a stored payload is made of)
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def _parse_pointer(pointer: str) -> list[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JsonPatchError(f"Invalid list index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"List index out of range: {index}")
+    return index
+
+
+def _resolve(doc, tokens: list[str]):
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return doc
+
+
+def _get(doc, path: str):
+    return _resolve(doc, _parse_pointer(path))
+
+
+def _add(doc, path: str, value):
+    tokens = _parse_pointer(path)
+    if not tokens:
+        return value
+    parent, key = _resolve(doc, tokens[:-1]), tokens[-1]
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, key, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to {path}")
+    return doc
+
+
+def _remove(doc, path: str):
+    tokens = _parse_pointer(path)
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent, key = _resolve(doc, tokens[:-1]), tokens[-1]
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise JsonPatchError(f"Path not found: {path}")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, key))
+    raise JsonPatchError(f"Path not found: {path}")
+
+
+def apply_patch(doc, operations: list[dict]):
+    """Apply operations to a copy of `doc`; the original is never modified."""
+    doc = copy.deepcopy(doc)
+    for op in operations:
+        if not isinstance(op, dict) or "op" not in op or "path" not in op:
+            raise JsonPatchError(f"Invalid operation: {op!r}")
+        name, path = op["op"], op["path"]
+        for key in ("path", "from"):
+            if key in op and not isinstance(op[key], str):
+                raise JsonPatchError(f"'{key}' must be a JSON pointer string")
+
+        if name in ("add", "replace", "test") and "value" not in op:
+            raise JsonPatchError(f"'{name}' requires a value")
+        if name in ("move", "copy") and "from" not in op:
+            raise JsonPatchError(f"'{name}' requires 'from'")
+
+        if name == "add":
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif name == "remove":
+            _remove(doc, path)
+        elif name == "replace":
+            if _parse_pointer(path):
+                _get(doc, path)
+                _remove(doc, path)
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif name == "move":
+            if path.startswith(op["from"] + "/"):
+                raise JsonPatchError("Cannot move a value into itself")
+            doc = _add(doc, path, _remove(doc, op["from"]))
+        elif name == "copy":
+            doc = _add(doc, path, copy.deepcopy(_get(doc, op["from"])))
+        elif name == "test":
+            if _get(doc, path) != op["value"]:
+                raise JsonPatchError(f"Test failed at {path}")
+        else:
+            raise JsonPatchError(f"Unknown operation: {name!r}")
+    return doc
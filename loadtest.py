@@ -0,0 +1,230 @@
+"""
+Replay recorded /generate-doc and /physicians traffic and report latency percentiles.
+
+    python loadtest.py data/traffic.jsonl                       # in-process through ASGI
+    python loadtest.py data/traffic.jsonl --url http://host:8000 --concurrency 16 --rate 5
+    python loadtest.py --synthesize 200 > data/synthetic.jsonl  # when nothing is recorded yet
+
+Record real traffic by starting the server with RECORD_TRAFFIC=1 (see traffic_recorder.py).
+--rate is an open-loop arrival rate in requests/second; 0 sends as fast as --concurrency
+allows and "recorded" keeps the original spacing. With a rate set, latency is measured
+from each request's scheduled start, so time spent queued behind a slow server counts.
+In-process runs point the share, the notes index, the shared store, physicians, settings
+and the archive at a temp folder (see sandbox), so a replay never writes to real data.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+
+import httpx
+import orjson
+
+
+# --- Traffic ---
+def load_traffic(path: str) -> list[dict]:
+    with open(path, "rb") as f:
+        return [orjson.loads(line) for line in f if line.strip()]
+
+
+def synthesize(count: int) -> list[dict]:
+    """Synthetic mix (about one note per four physician lookups) built from the benchmark payload."""
+    from bench_json import follow_up_payload
+    from traffic_recorder import anonymize
+
+    body = anonymize(follow_up_payload())
+    traffic = []
+    for i in range(count):
+        if i % 5 == 0:
+            traffic.append({"ts": i * 0.5, "method": "POST", "path": "/generate-doc", "query": "", "body": body})
+        else:
+            traffic.append({"ts": i * 0.5, "method": "GET", "path": "/physicians", "query": "", "body": None})
+    return traffic
+
+
+def schedule(traffic: list[dict], rate: str) -> list[float]:
+    """Start offsets in seconds for each request."""
+    if rate == "recorded":
+        first = traffic[0]["ts"]
+        return [entry["ts"] - first for entry in traffic]
+    per_second = float(rate)
+    if per_second <= 0:
+        return [0.0] * len(traffic)
+    return [i / per_second for i in range(len(traffic))]
+
+
+# --- Replay ---
+async def replay(client: httpx.AsyncClient, traffic: list[dict], offsets: list[float], concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    results = defaultdict(list)
+    statuses = defaultdict(Counter)
+    paced = any(offsets)
+    started = time.perf_counter()
+
+    async def send(entry: dict, offset: float):
+        await asyncio.sleep(max(0.0, started + offset - time.perf_counter()))
+        scheduled = started + offset
+        async with slots:
+            sent = time.perf_counter()
+            url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+            try:
+                response = await client.request(
+                    entry["method"], url, content=orjson.dumps(entry["body"]) if entry.get("body") is not None else None,
+                    headers={"Content-Type": "application/json"},
+                )
+                await response.aread()
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+        results[entry["path"]].append(time.perf_counter() - (scheduled if paced else sent))
+        statuses[entry["path"]][status] += 1
+
+    await asyncio.gather(*(send(entry, offset) for entry, offset in zip(traffic, offsets)))
+    return {"wall_seconds": time.perf_counter() - started, "latencies": results, "statuses": statuses}
+
+
+# --- Sandbox ---
+def sandbox(root: str) -> str:
+    """
+    Point every file the app writes at `root` (before its lifespan starts), so replayed
+    notes, physicians and retention passes never touch the share or data/. Returns `root`.
+    """
+    import main
+    import notes_index
+    import note_archive
+    import note_search
+    import retention
+    import settings
+    import shared_store
+    import upload_verifier
+
+    data_dir = os.path.join(root, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    # Real physicians keep /physicians responses the recorded size; writes go to the copy
+    physicians_file = os.path.join(data_dir, "physicians.json")
+    if os.path.exists(main.PHYSICIAN_FILE):
+        shutil.copyfile(main.PHYSICIAN_FILE, physicians_file)
+    main.PHYSICIAN_FILE = physicians_file
+
+    notes_index.NOTES_DB_FILE = os.path.join(data_dir, "notes.db")
+    shared_store.SHARED_DB_FILE = os.path.join(data_dir, "shared.db")
+    upload_verifier.UPLOAD_LEDGER_FILE = os.path.join(data_dir, "upload_ledger.json")
+    note_archive.ARCHIVE_DIR = os.path.join(data_dir, "archive")
+    note_archive.LEGACY_ARCHIVE_DIR = None
+    note_archive.BLOB_DIR = os.path.join(note_archive.ARCHIVE_DIR, "blobs")
+    note_archive.MANIFEST_DIR = os.path.join(note_archive.ARCHIVE_DIR, "manifests")
+    note_archive.PDF_DIR = os.path.join(note_archive.ARCHIVE_DIR, "pdf")
+    retention.GENERATED_DIR = note_search.GENERATED_DIR = os.path.join(root, "generated")
+
+    # Saved settings may name the real share; a replay runs on defaults with its own root
+    settings.SETTINGS_FILE = os.path.join(data_dir, "settings.json")
+    settings.DEFAULT_SETTINGS["prc_root"] = os.path.join(root, "prc")
+    # Replayed traffic must not be recorded again
+    settings.DEFAULT_SETTINGS["traffic_recording"] = {**settings.DEFAULT_SETTINGS["traffic_recording"], "enabled": False}
+    settings._settings = None
+    return root
+
+
+async def run_in_process(traffic, offsets, concurrency) -> dict:
+    import main
+
+    sandbox(tempfile.mkdtemp(prefix="prc-loadtest-"))
+
+    async with main.lifespan(main.app):
+        # Same gate as a load balancer: wait for warm-up before sending traffic
+        while not main.readiness.report()[0]:
+            await asyncio.sleep(0.1)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            return await replay(client, traffic, offsets, concurrency)
+
+
+async def run_against(url: str, traffic, offsets, concurrency) -> dict:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        return await replay(client, traffic, offsets, concurrency)
+
+
+# --- Report ---
+def percentile(sorted_values: list[float], pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def report(outcome: dict) -> dict:
+    routes = {}
+    for path, latencies in outcome["latencies"].items():
+        ms = sorted(s * 1000 for s in latencies)
+        statuses = outcome["statuses"][path]
+        errors = sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 400)
+        routes[path] = {
+            "requests": len(ms),
+            "throughput_rps": round(len(ms) / outcome["wall_seconds"], 2),
+            "p50_ms": round(percentile(ms, 50), 1),
+            "p95_ms": round(percentile(ms, 95), 1),
+            "p99_ms": round(percentile(ms, 99), 1),
+            "max_ms": round(ms[-1], 1),
+            "error_rate": round(errors / len(ms), 4),
+            "statuses": dict(statuses),
+        }
+    total = sum(r["requests"] for r in routes.values())
+    return {"wall_seconds": round(outcome["wall_seconds"], 2), "requests": total,
+            "throughput_rps": round(total / outcome["wall_seconds"], 2), "routes": routes}
+
+
+def print_report(summary: dict):
+    print(f"{summary['requests']} requests in {summary['wall_seconds']} s ({summary['throughput_rps']} req/s)")
+    for path, r in summary["routes"].items():
+        print(
+            f"  {path:<14} n={r['requests']:<5} {r['throughput_rps']:>7} req/s   "
+            f"p50 {r['p50_ms']:>8} ms   p95 {r['p95_ms']:>8} ms   p99 {r['p99_ms']:>8} ms   "
+            f"errors {r['error_rate']:.1%}   {r['statuses']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against the app.")
+    parser.add_argument("traffic", nargs="?", help="JSONL recorded by traffic_recorder.py")
+    parser.add_argument("--url", help="base URL of a running server; default is in-process ASGI")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", default="0", help='requests/second, 0 for closed loop, or "recorded"')
+    parser.add_argument("--repeat", type=int, default=1, help="replay the recording this many times")
+    parser.add_argument("--synthesize", type=int, metavar="N", help="print N synthetic requests as JSONL and exit")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        for entry in synthesize(args.synthesize):
+            sys.stdout.write(orjson.dumps(entry).decode() + "\n")
+        return
+    if not args.traffic:
+        parser.error("a traffic file is required (or use --synthesize)")
+
+    recorded = load_traffic(args.traffic)
+    if not recorded:
+        parser.error(f"no requests in {args.traffic}")
+    traffic = recorded * args.repeat
+    if args.rate == "recorded" and args.repeat > 1:
+        span = recorded[-1]["ts"] - recorded[0]["ts"] + 1
+        traffic = [{**entry, "ts": entry["ts"] + span * (i // len(recorded))} for i, entry in enumerate(traffic)]
+    offsets = schedule(traffic, args.rate)
+
+    if args.url:
+        outcome = asyncio.run(run_against(args.url, traffic, offsets, args.concurrency))
+    else:
+        outcome = asyncio.run(run_in_process(traffic, offsets, args.concurrency))
+
+    summary = report(outcome)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
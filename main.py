@@ -3,18 +3,65 @@ import json
 import io
 import string
 import sys
-import traceback
+import logging
+import threading
 import subprocess
+import zipfile
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
-from pydantic import BaseModel
-from docxtpl import DocxTemplate
-from docx2pdf import convert
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from pydantic import BaseModel, ValidationError, field_validator
 from fastapi import UploadFile, File
+import orjson
+import notes_index
+import shared_store
+import note_search
+import json_patch
+import settings
+import template_registry
+import retention
+import readiness
+import async_io
+import admission
+import idempotency
+import job_progress
+import app_logging
+from app_logging import log_event
+from json_io import OrjsonResponse, OrjsonRoute
+from payload_models import FollowUpPayload, known_date, unknown_fields, validation_detail
+from traffic_recorder import TrafficRecorder
+from zipstream import iter_zip
+
+# docxtpl (Jinja, lxml, python-docx), docx2pdf (Word/pywin32 probing) and pdf_render (fpdf2)
+# are imported on first use or by the startup warm-up, never at import time
+if TYPE_CHECKING:
+    from docxtpl import DocxTemplate
 
 # --- App Setup ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app_logging.start()
+    await async_io.run_io(ensure_data_files)
+    # Discovers templates/ and watches it, so new or edited templates need no restart
+    await async_io.run_io(template_registry.start)
+    # Warm up in the background so startup isn't held up by heavy imports
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    retention.start()
+    yield
+    retention.stop()
+    template_registry.stop()
+    async_io.shutdown()
+    app_logging.stop()
+
+app = FastAPI(lifespan=lifespan, default_response_class=OrjsonResponse)
+app.router.route_class = OrjsonRoute
 
 # CORS Middleware
 app.add_middleware(
@@ -25,25 +72,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in, anonymized capture of /generate-doc and /physicians traffic for loadtest.py
+app.add_middleware(TrafficRecorder)
+
 # --- Constants & Directories ---
 PHYSICIAN_FILE = "data/physicians.json"
-TEMPLATE_FILE = "templates/FU_TEMPLATE_Klickovich.docx"
-
-# User-specified path for PRC_FOLDER (can be changed directly)
-PRC_FOLDER = "F:/PRC 2025/SEPT-2025/09-06-2025"  # Example path
-PDF_FOLDER = os.path.join(PRC_FOLDER, "PDF")
 
-# Ensure PDF folder exists
-os.makedirs(PDF_FOLDER, exist_ok=True)
-os.makedirs("data", exist_ok=True)
-os.makedirs("templates", exist_ok=True)
+# --- Ensure Directories & Physicians File Exist (run at startup, off the event loop) ---
+# PRC day folders are derived from the evaluation date (see settings.py)
+def ensure_data_files():
+    import note_archive
 
-print(f"✅ PDF folder created at: {PDF_FOLDER}")
-
-# --- Ensure Physicians File Exists ---
-if not os.path.exists(PHYSICIAN_FILE):
-    with open(PHYSICIAN_FILE, "w") as f:
-        json.dump([], f)
+    os.makedirs("data", exist_ok=True)
+    note_archive.move_legacy_archive()
+    os.makedirs("templates", exist_ok=True)
+    if not os.path.exists(PHYSICIAN_FILE):
+        with open(PHYSICIAN_FILE, "w") as f:
+            json.dump([], f)
 
 # --- Load/Save Helpers ---
 def load_physicians():
@@ -51,8 +96,11 @@ def load_physicians():
         return json.load(f)
 
 def save_physicians(physicians):
-    with open(PHYSICIAN_FILE, "w") as f:
+    # Replaced in one step, so a reader in another worker never sees a half-written list
+    tmp_file = f"{PHYSICIAN_FILE}.tmp"
+    with open(tmp_file, "w") as f:
         json.dump(physicians, f, indent=2)
+    os.replace(tmp_file, PHYSICIAN_FILE)
 
 # --- Model ---
 class Physician(BaseModel):
@@ -60,94 +108,302 @@ class Physician(BaseModel):
 
 # --- Physician Routes ---
 @app.get("/physicians")
-def get_physicians():
-    return load_physicians()
+async def get_physicians():
+    physicians = await async_io.run_io(load_physicians)
+    log_event("physicians.listed", route="/physicians", count=len(physicians))
+    return physicians
+
+def _add_physician(name: str) -> bool:
+    # Every worker writes this file; the shared store's lock serializes them
+    with shared_store.exclusive():
+        physicians = load_physicians()
+        if any(p.lower() == name.lower() for p in physicians):
+            return False
+        physicians.append(name)
+        save_physicians(physicians)
+        return True
 
 @app.post("/physicians")
-def add_physician(physician: Physician):
+async def add_physician(physician: Physician):
     name = physician.name.strip()
     if not name:
         raise HTTPException(status_code=400, detail="Name is required")
 
-    physicians = load_physicians()
-    if any(p.lower() == name.lower() for p in physicians):
-        return JSONResponse(content={"message": "Physician already exists"}, status_code=200)
+    if not await async_io.run_io(_add_physician, name):
+        return OrjsonResponse(content={"message": "Physician already exists"}, status_code=200)
 
-    physicians.append(name)
-    save_physicians(physicians)
     return {"message": "Physician added", "name": name}
 
-# --- Global Dictionary to Store fileName ---
-file_name_storage = {}
+# --- Per-Session State (shared by all workers) ---
+def session_scope(request: Request) -> str:
+    # Frontends can send X-Session-Id; otherwise state is kept per client address
+    session_id = request.headers.get("x-session-id") or (request.client.host if request.client else "anonymous")
+    return f"session:{session_id}"
+
+# --- Template Loading ---
+def load_template(template: dict | None = None) -> "DocxTemplate":
+    """Fresh DocxTemplate for a registry entry; the default template when omitted."""
+    from docxtpl import DocxTemplate
+    import fragment_cache
+
+    template_class = DocxTemplate
+    if settings.load_settings().get("fragment_cache") and fragment_cache.enabled:
+        template_class = fragment_cache.CachingDocxTemplate
+
+    template = template or template_registry.get()
+    return template_class(io.BytesIO(template_registry.source(template)))
+
+def convert_to_pdf(docx_path: str, pdf_path: str):
+    from docx2pdf import convert
+
+    convert(docx_path, pdf_path)
+
+def pdf_renderer() -> str:
+    choice = settings.load_settings().get("pdf_renderer", "auto")
+    if choice == "auto":
+        # docx2pdf drives Word, which only exists on Windows and macOS
+        return "docx2pdf" if sys.platform in ("win32", "darwin") else "direct"
+    return choice
+
+def write_pdf(doc: "DocxTemplate", docx_path: str, pdf_path: str) -> str:
+    """PDF of a rendered note (already saved to docx_path) with the configured renderer."""
+    renderer = pdf_renderer()
+    if renderer == "direct":
+        import pdf_render
+
+        pdf_render.write_pdf(doc, pdf_path)
+    else:
+        convert_to_pdf(docx_path, pdf_path)
+    return renderer
+
+# --- Startup Warm-Up (reported by /ready) ---
+readiness.register("template")
+readiness.register("render")
+# PDF conversion and uploads already degrade gracefully, so they don't gate readiness
+readiness.register("converter", required=False)
+readiness.register("browser", required=False)
+
+def _dummy_note() -> dict:
+    return FollowUpPayload(patientName="Warm Up", dateOfEvaluation="01/01/2000").model_dump()
+
+def _warm_browser():
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    webdriver.Chrome(options=options).quit()
+
+def warm_up():
+    started = app_logging.timer()
+    policy = {**settings.DEFAULT_SETTINGS["warm_up"], **(settings.load_settings().get("warm_up") or {})}
+
+    with readiness.warming("template"):
+        for template in template_registry.templates():
+            load_template(template_registry.get(template["id"]))
+            template_registry.variables(template_registry.get(template["id"]))
+
+    # Render in memory so Jinja compiles the template's expressions; nothing touches the share
+    with readiness.warming("render"):
+        load_template().render(_dummy_note())
+        if settings.load_settings().get("fragment_cache"):
+            import fragment_cache
+
+            # Section caching must be invisible; fall back to whole renders if it ever isn't
+            if not fragment_cache.matches_plain(template_registry.source(template_registry.get()), _dummy_note()):
+                fragment_cache.enabled = False
+                log_event("fragment_cache.disabled", level=logging.WARNING, reason="render mismatch")
+
+    # One throwaway conversion starts Word (or imports fpdf2) and pages it in before real traffic
+    if policy["converter"]:
+        with readiness.warming("converter"), tempfile.TemporaryDirectory(prefix="prc-warm-") as tmp:
+            doc = load_template()
+            doc.render(_dummy_note())
+            doc.save(os.path.join(tmp, "warm_up.docx"))
+            write_pdf(doc, os.path.join(tmp, "warm_up.docx"), os.path.join(tmp, "warm_up.pdf"))
+    else:
+        readiness.skip("converter", "disabled in warm_up settings")
+
+    if policy["browser"]:
+        with readiness.warming("browser"):
+            _warm_browser()
+    else:
+        readiness.skip("browser", "disabled in warm_up settings")
+
+    ready, subsystems = readiness.report()
+    log_event("warm_up.done", ready=ready, elapsed_ms=app_logging.elapsed_ms(started),
+              subsystems={name: info["state"] for name, info in subsystems.items()})
 
 # --- Generate DOCX and PDF ---
-def generate_docx_from_data(data: dict) -> tuple[io.BytesIO, str, str]:
+def save_docx(doc: "DocxTemplate", docx_path: str) -> bytes:
+    """Write the rendered note next to its path and swap it in, so a download in progress never reads half a file."""
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    docx_bytes = buffer.getvalue()
+    tmp_file = f"{docx_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(docx_bytes)
+    os.replace(tmp_file, docx_path)
+    return docx_bytes
+
+def _try_convert(doc: "DocxTemplate", docx_path: str, pdf_path: str, route: str, started: float) -> bool:
     try:
-        print("➡️ Starting document generation...")
+        renderer = write_pdf(doc, docx_path, pdf_path)
+        log_event("pdf.converted", route=route, renderer=renderer, elapsed_ms=app_logging.elapsed_ms(started))
+        return True
+    except Exception as e:
+        log_event("pdf.conversion_failed", route=route, level=logging.WARNING, error=app_logging.error_text(e))
+        return False
 
-        if not os.path.exists(TEMPLATE_FILE):
-            raise HTTPException(status_code=500, detail="Template file not found.")
+def generate_docx_from_data(data: dict, job: str | None = None) -> tuple[io.BytesIO, str, str, int]:
+    try:
+        started = app_logging.timer()
 
-        doc = DocxTemplate(TEMPLATE_FILE)
+        template = template_registry.resolve(data.get("templateId", ""), data.get("physician", ""))
+        job_progress.emit(job, "generate.rendering", templateId=template["id"])
+        doc = load_template(template)
         data.setdefault('docSections', [])
         doc.render(data)
 
         file_name = data.get("fileName") or data.get("patientName", "follow_up")
 
-        # Clear previous fileName value and store the new one
-        file_name_storage.clear()  # Clear existing stored fileName
-        file_name_storage["last_used"] = file_name  # Store the new fileName
-
         allowed_punctuation = "-_.,()[]"
         safe_file_name = "".join(c for c in file_name if c.isalnum() or c in string.whitespace or c in allowed_punctuation).strip()
 
-        docx_path = os.path.join(PDF_FOLDER, f"{safe_file_name}.docx")
-        pdf_path = os.path.join(PDF_FOLDER, f"{safe_file_name}.pdf")
+        pdf_folder = settings.pdf_folder(data.get("dateOfEvaluation"))
+        docx_path = os.path.join(pdf_folder, f"{safe_file_name}.docx")
+        pdf_path = os.path.join(pdf_folder, f"{safe_file_name}.pdf")
 
-        doc.save(docx_path)
-        print(f"✅ DOCX saved: {docx_path}")
+        docx_bytes = save_docx(doc, docx_path)
+        log_event("docx.saved", route="/generate-doc", elapsed_ms=app_logging.elapsed_ms(started))
+        job_progress.emit(job, "generate.converting")
 
-        try:
-            convert(docx_path, pdf_path)
-            print(f"✅ PDF converted: {pdf_path}")
-        except Exception as e:
-            print("⚠️ PDF conversion failed:", e)
+        pdf_converted = _try_convert(doc, docx_path, pdf_path, "/generate-doc", started)
+        job_progress.emit(job, "generate.indexing", pdfConverted=pdf_converted)
+
+        byte_io = io.BytesIO(docx_bytes)
 
-        byte_io = io.BytesIO()
-        with open(docx_path, "rb") as f:
-            byte_io.write(f.read())
-        byte_io.seek(0)
+        # Index the note so uploads and reprints can find it without probing the share
+        note_id = notes_index.add_note(
+            file_name=safe_file_name,
+            patient_name=data.get("patientName"),
+            date_of_evaluation=data.get("dateOfEvaluation"),
+            template_version=notes_index.template_version(template["path"]),
+            docx_path=docx_path,
+            docx_sha256=notes_index.sha256_bytes(docx_bytes),
+            docx_size=len(docx_bytes),
+            pdf_path=pdf_path if pdf_converted else None,
+            pdf_sha256=notes_index.sha256_file(pdf_path) if pdf_converted else None,
+            pdf_size=os.path.getsize(pdf_path) if pdf_converted else None,
+        )
 
-        return byte_io, pdf_path, data.get("dateOfEvaluation", "")
+        # Kept so PATCH /notes/{id} can re-render an edit without the whole payload
+        notes_index.save_payload(note_id, data, pdf_rendered=pdf_converted)
+        note_search.index_rendered_note(note_id, docx_bytes, data)
+
+        return byte_io, pdf_path, data.get("dateOfEvaluation", ""), note_id
 
     except Exception as e:
-        print("[❌ ERROR] Failed to generate DOCX/PDF")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error generating DOCX/PDF: {str(e)}")
+        log_event("generate.failed", route="/generate-doc", level=logging.ERROR, exc_info=True)
+        job_progress.emit(job, "generate.failed", error=app_logging.error_text(e))
+        raise HTTPException(status_code=500, detail=f"Error generating DOCX/PDF: {app_logging.error_text(e)}")
 
 # --- /generate-doc Endpoint ---
-@app.post("/generate-doc")
-async def generate_doc(request: Request):
-    print("🔔 /generate-doc triggered")
-    data = await request.json()
-    print("📥 Data received:", data)
-
-    # Generate DOCX and PDF
-    file_stream, pdf_path, date_of_eval = generate_docx_from_data(data)
+async def _render_note(data: dict, request: Request, job: str) -> tuple[io.BytesIO, int, str]:
+    job_progress.emit(job, "generate.queued")
+    # Each render launches a PDF conversion, so only a bounded number run at once
+    try:
+        async with admission.generate_gate.admit() as waited_ms:
+            if waited_ms >= 1:
+                log_event("generate.queued", route="/generate-doc", wait_ms=round(waited_ms, 2))
+            # Generate DOCX and PDF on the disk pool so a slow share doesn't stall other requests
+            file_stream, pdf_path, date_of_eval, note_id = await async_io.run_io(generate_docx_from_data, data, job)
+    except admission.Overloaded as e:
+        job_progress.emit(job, "generate.failed", error="busy", retryAfter=e.retry_after)
+        raise
     file_name = data.get("fileName") or data.get("patientName", "follow_up")
+    await async_io.run_io(shared_store.put, session_scope(request), "last_used", file_name)
 
     # Optional PDF upload
-    if pdf_path and os.path.exists(pdf_path):
+    if pdf_path and await async_io.run_io(os.path.exists, pdf_path):
         try:
             title = f"TRANSCRIBED DATA FOLLOW UP VISIT NOTE ON {date_of_eval}"
-            print(f"📤 Would upload PDF with title: {title}")
+            log_event("upload.skipped", route="/generate-doc", note_id=note_id, title=title)
             # upload_pdf_to_portal(file_path=pdf_path, document_title=title, notes=title)
         except Exception as e:
-            print("⚠️ Upload failed:", e)
+            log_event("upload.failed", route="/generate-doc", level=logging.WARNING, note_id=note_id, error=app_logging.error_text(e))
+
+    job_progress.emit(job, "generate.done", noteId=note_id)
+    return file_stream, note_id, file_name
+
+def _read_note_docx(note_id: int) -> io.BytesIO:
+    note = notes_index.get_note(note_id)
+    if not note or not note["docx_path"] or not os.path.exists(note["docx_path"]):
+        raise HTTPException(status_code=410, detail="The note for this Idempotency-Key is no longer available")
+    with open(note["docx_path"], "rb") as f:
+        return io.BytesIO(f.read())
+
+@app.post("/generate-doc")
+async def generate_doc(request: Request):
+    # Validate before paying for a render; parsing happens in pydantic-core
+    body = await request.body()
+    try:
+        payload, template_fields = FollowUpPayload.model_validate_json(body), {}
+    except ValidationError as e:
+        try:
+            payload, template_fields = await async_io.run_io(_with_template_fields, body, e)
+        except ValidationError as e:
+            return OrjsonResponse(status_code=422, content={"error": "Invalid payload", "fields": validation_detail(e)})
+
+    data = {**payload.model_dump(), **template_fields}
+    try:
+        template = template_registry.resolve(payload.templateId, payload.physician)
+    except template_registry.UnknownTemplate:
+        return OrjsonResponse(status_code=422, content={"error": f"Unknown templateId: {payload.templateId}"})
+    # Stored with the payload, so PATCH re-renders with the same template
+    data["templateId"] = template["id"]
+    # A payload that doesn't fit its template fails here, not after a render
+    problems = template_registry.mismatch(
+        await _template_variables(template), data, payload.model_fields_set | template_fields.keys(),
+    )
+    if problems:
+        return OrjsonResponse(status_code=422, content={"error": f"Payload does not match template {template['id']}", **problems})
+    log_event("generate.received", route="/generate-doc", payload=app_logging.redact_payload(data))
+
+    # Clients may pick the job id up front and subscribe to /jobs/{id}/events before posting
+    job_id = job_progress.job_id_from(request.headers.get("x-job-id"))
+    job = job_progress.job_key(session_scope(request), job_id)
+    replayed = False
+    idempotency_key = request.headers.get("idempotency-key")
+    if not idempotency_key:
+        file_stream, note_id, file_name = await _render_note(data, request, job)
+    else:
+        # Retries and double-clicks with the same key share one render
+        rendered = {}
+
+        async def render_once() -> dict:
+            rendered["stream"], note_id, file_name = await _render_note(data, request, job)
+            return {"note_id": note_id, "file_name": file_name}
+
+        try:
+            result, replayed = await idempotency.single_flight(
+                f"{session_scope(request)}:{idempotency_key}", notes_index.sha256_bytes(body), render_once,
+            )
+        except idempotency.KeyReuseError:
+            return OrjsonResponse(status_code=409, content={"error": "Idempotency-Key was already used with a different payload"})
+
+        note_id, file_name = result["note_id"], result["file_name"]
+        file_stream = rendered.get("stream") or await async_io.run_io(_read_note_docx, note_id)
+        if replayed:
+            log_event("generate.replayed", route="/generate-doc", note_id=note_id)
+            job_progress.emit(job, "generate.done", noteId=note_id, replayed=True)
 
     headers = {
-        'Content-Disposition': f'attachment; filename="{file_name}.docx"'
+        'Content-Disposition': f'attachment; filename="{file_name}.docx"',
+        'X-Note-Id': str(note_id),
+        'X-Job-Id': job_id,
     }
+    if replayed:
+        headers['Idempotent-Replayed'] = 'true'
 
     return StreamingResponse(
         file_stream,
@@ -158,57 +414,497 @@ async def generate_doc(request: Request):
 # --- /upload-documents Endpoint ---
 class FileUploadRequest(BaseModel):
     fileName: str
-    path: str   # "path1" or "path2"
+    # "path1" or "path2". Only used for notes the index doesn't know: an indexed note
+    # always uploads the PDF it was rendered to, wherever copies of it were made
+    path: str
+    dateOfEvaluation: str | None = None   # picks the day folder; defaults to today
+
+    _known_evaluation_date = field_validator("dateOfEvaluation")(known_date)
+
+NOTE_EXTENSIONS = (".pdf", ".docx")
+
+def _note_name(file_name: str) -> str:
+    """File name without a .pdf/.docx extension; dots elsewhere ("Doe Jr. John") are part of the name."""
+    root, extension = os.path.splitext(file_name)
+    return root if extension.lower() in NOTE_EXTENSIONS else file_name
+
+def _launch_uploader(upload_name: str, base_path: str, job: str, template_id: str | None = None):
+    job_progress.emit(job, "upload.queued", fileName=upload_name)
+    # The uploader reports its own stages against the same job
+    env = {**os.environ, "PRC_JOB": job}
+    provider = template_registry.portal_provider(template_id)
+    if provider:
+        env["PRC_PORTAL_PROVIDER"] = provider
+    subprocess.Popen([sys.executable, "selenium_uploader.py", upload_name, base_path], env=env)
+
+def _trigger_upload(request: FileUploadRequest, scope: str, job_id: str) -> dict:
+    file_name = request.fileName.strip()
+    path_choice = request.path
+    if path_choice not in retention.UPLOAD_FOLDERS:
+        raise HTTPException(status_code=400, detail=f"Invalid path: {path_choice}")
+
+    # Remember the fileName for this session
+    shared_store.put(scope, "last_uploaded", file_name)
+    upload_name = _note_name(file_name)
+    job = job_progress.job_key(scope, job_id)
+
+    # Indexed notes are resolved without touching the share
+    note = notes_index.find_latest_by_file_name(upload_name)
+    if note and note["pdf_path"]:
+        # After PATCH ?pdf=false the PDF on disk is the pre-edit note; it must not reach the portal
+        if notes_index.pdf_is_stale(note["id"]):
+            raise HTTPException(
+                status_code=409,
+                detail=f"The PDF of note {note['id']} predates its last edit; re-render it with PATCH /notes/{note['id']}?pdf=true",
+            )
+        base_path = os.path.dirname(note["pdf_path"])
+        upload_name = os.path.splitext(os.path.basename(note["pdf_path"]))[0]
+
+        log_event("upload.triggered", route="/upload-documents", note_id=note["id"])
+        stored = notes_index.get_payload(note["id"])
+        _launch_uploader(upload_name, base_path, job, stored["payload"].get("templateId") if stored else None)
+        notes_index.set_upload_state(note["id"], notes_index.UPLOAD_QUEUED)
+
+        return {"message": f"Upload triggered for '{file_name}' from index.", "noteId": note["id"], "jobId": job_id}
+
+    # Define paths (created once per day folder)
+    pdf_folder = settings.pdf_folder(request.dateOfEvaluation)
+    path1 = settings.ensure_dir(os.path.join(pdf_folder, "path1"))
+    path2 = settings.ensure_dir(os.path.join(pdf_folder, "path2"))
+    base_path = path1 if path_choice == "path1" else path2
+
+    # The uploader always sends <name>.pdf
+    if not os.path.exists(os.path.join(base_path, f"{upload_name}.pdf")):
+        raise HTTPException(status_code=404, detail=f"File not found: {upload_name}.pdf in {path_choice}")
+
+    log_event("upload.triggered", route="/upload-documents", path=path_choice)
+
+    # Run selenium uploader with single path
+    _launch_uploader(upload_name, base_path, job)
+
+    return {"message": f"Upload triggered for '{file_name}' from {path_choice}.", "jobId": job_id}
 
 @app.post("/upload-documents")
-async def upload_documents(request: FileUploadRequest):
+async def upload_documents(request: FileUploadRequest, http_request: Request):
     try:
-        file_name = request.fileName.strip()
-        path_choice = request.path
+        # Share lookups and the uploader launch run on the disk pool
+        job_id = job_progress.job_id_from(http_request.headers.get("x-job-id"))
+        return await async_io.run_io(_trigger_upload, request, session_scope(http_request), job_id)
+
+    except HTTPException as e:
+        log_event("upload.rejected", route="/upload-documents", level=logging.WARNING, status=e.status_code)
+        return OrjsonResponse(status_code=e.status_code, content={"error": e.detail})
 
-        # Clear and store the new fileName for upload
-        file_name_storage.clear()  # Clear existing stored fileName
-        file_name_storage["last_uploaded"] = file_name  # Store the new fileName
+    except Exception as e:
+        log_event("upload.failed", route="/upload-documents", level=logging.ERROR, error=app_logging.error_text(e))
+        return OrjsonResponse(status_code=500, content={"error": app_logging.error_text(e)})
+
+# --- Templates ---
+@app.get("/templates")
+def list_templates():
+    return template_registry.templates()
+
+async def _template_variables(template: dict) -> frozenset:
+    # Extracted once per template version; a cold one (just edited) is extracted off the event loop
+    found = template_registry.cached_variables(template)
+    if found is None:
+        found = await async_io.run_io(template_registry.variables, template)
+    return found
+
+def _with_template_fields(raw, error: ValidationError) -> tuple[FollowUpPayload, dict]:
+    """
+    Retry a payload the strict model rejected only for unknown keys: the ones its template
+    declares are set aside and rendered as sent. Raises the ValidationError otherwise.
+    """
+    unknown = unknown_fields(error)
+    if not unknown:
+        raise error
+    if isinstance(raw, bytes):
+        try:
+            raw = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            raise error
+    # Only extra keys failed, but make sure before the routing fields reach the registry
+    if not isinstance(raw, dict) or not all(isinstance(raw.get(k, ""), str) for k in ("templateId", "physician")):
+        raise error
+    try:
+        template = template_registry.resolve(raw.get("templateId", ""), raw.get("physician", ""))
+    except template_registry.UnknownTemplate:
+        raise error
+    declared = unknown & template_registry.variables(template)
+    payload = FollowUpPayload.model_validate({k: v for k, v in raw.items() if k not in declared})
+    return payload, {k: raw[k] for k in declared}
+
+def _mismatch_detail(template: dict, problems: dict) -> str:
+    parts = [f"{kind}: {', '.join(names)}" for kind, names in problems.items() if names]
+    return f"Payload does not match template {template['id']} ({'; '.join(parts)})"
+
+@app.get("/templates/{template_id}/variables")
+async def template_variables(template_id: str):
+    """Jinja variables the template reads; `templateOnly` ones have no field in the payload model and render as sent."""
+    try:
+        template = template_registry.get(template_id)
+    except template_registry.UnknownTemplate:
+        raise HTTPException(status_code=404, detail=f"Unknown template: {template_id}")
+    names = await _template_variables(template)
+    return {
+        "templateId": template["id"],
+        "variables": sorted(names),
+        "templateOnly": sorted(names - FollowUpPayload.model_fields.keys()),
+    }
 
-        # Define paths
-        path1 = os.path.join(PDF_FOLDER, "path1")
-        path2 = os.path.join(PDF_FOLDER, "path2")
+# --- Job Progress (Server-Sent Events) ---
+# Only the session that started a job sees its events (see job_progress.job_key)
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, request: Request):
+    return {"jobId": job_id, "events": job_progress.events(job_progress.job_key(session_scope(request), job_id))}
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, follow: bool = False):
+    # EventSource sends Last-Event-ID when it reconnects
+    last_event_id = request.headers.get("last-event-id", "0")
+    job = job_progress.job_key(session_scope(request), job_id)
+    stream = job_progress.sse_stream(job, int(last_event_id) if last_event_id.isdigit() else 0, follow)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
+
+# --- /notes Endpoint (indexed lookups by patient or date) ---
+@app.get("/notes")
+def list_notes(patient: str | None = None, date: str | None = None, limit: int = 100):
+    try:
+        return notes_index.find_notes(patient_name=patient, date_of_evaluation=date, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/notes/search")
+def search_notes(q: str, limit: int = 20):
+    return note_search.search(q, limit=limit)
+
+# --- Note Download Routes (Range, ETag, If-Modified-Since) ---
+NOTE_MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
 
-        # Ensure directories exist
-        os.makedirs(path1, exist_ok=True)
-        os.makedirs(path2, exist_ok=True)
+def _archived_note_response(note: dict, kind: str):
+    import note_archive
 
-        # Choose correct folder
-        if path_choice == "path1":
-            base_path = path1
-        elif path_choice == "path2":
-            base_path = path2
-        else:
-            raise HTTPException(status_code=400, detail=f"Invalid path: {path_choice}")
+    name = note[f"{kind}_archive"]
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="{note["file_name"]}.{kind}"',
+        "X-Archived": "true",
+    }
+    if kind == "pdf":
+        path = note_archive.pdf_path(name)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail=f"Archived PDF for note {note['id']} is missing")
+        return FileResponse(path, media_type=NOTE_MEDIA_TYPES[kind], headers=headers)
+    try:
+        # Rebuilt from the blob store as it streams; nothing is written back to the share
+        stream = note_archive.iter_docx(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Archived DOCX for note {note['id']} is missing")
+    return StreamingResponse(stream, media_type=NOTE_MEDIA_TYPES[kind], headers=headers)
+
+def _note_file_response(request: Request, note_id: int, kind: str):
+    note = notes_index.get_note(note_id)
+    if note and not note[f"{kind}_path"] and note[f"{kind}_archive"]:
+        return _archived_note_response(note, kind)
+    if not note or not note[f"{kind}_path"]:
+        raise HTTPException(status_code=404, detail=f"No {kind.upper()} for note {note_id}")
+
+    path = note[f"{kind}_path"]
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"File for note {note_id} is missing")
+
+    headers = {"Cache-Control": "private, no-cache"}
+    # A DOCX-only PATCH leaves the previous PDF in place until the next conversion
+    if kind == "pdf" and notes_index.pdf_is_stale(note_id):
+        headers["X-PDF-Stale"] = "true"
+    # Indexed content hash is a strong validator as long as the file is unchanged
+    if note[f"{kind}_sha256"] and note[f"{kind}_size"] == stat.st_size:
+        headers["ETag"] = f'"{note[f"{kind}_sha256"]}"'
+        if _not_modified(request, headers["ETag"], stat.st_mtime):
+            headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+            return Response(status_code=304, headers=headers)
+
+    # FileResponse handles Range/If-Range and streams from disk (pathsend when the server offers it)
+    return FileResponse(
+        path,
+        media_type=NOTE_MEDIA_TYPES[kind],
+        filename=os.path.basename(path),
+        headers=headers,
+        stat_result=stat,
+    )
 
-        file_path = os.path.join(base_path, file_name)
-        if not os.path.exists(file_path):
-            raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
+@app.get("/notes/{note_id}/docx")
+def download_note_docx(note_id: int, request: Request):
+    return _note_file_response(request, note_id, "docx")
+
+@app.get("/notes/{note_id}/pdf")
+def download_note_pdf(note_id: int, request: Request):
+    return _note_file_response(request, note_id, "pdf")
+
+# --- PATCH /notes/{id} (JSON Patch against the stored payload) ---
+# These pick the note's folder and file name; changing them means a new note
+IMMUTABLE_FIELDS = ("fileName", "dateOfEvaluation")
+# One edit of a note at a time across workers; longer than any render and conversion
+NOTE_EDIT_LEASE_SECONDS = 300
+# How long a PATCH waits for an edit of the same note to finish before giving up with 409
+NOTE_EDIT_WAIT_SECONDS = 15
+
+def _if_match_revision(value: str | None) -> int | None:
+    """The payload revision an If-Match header asks for (as sent back in X-Note-Revision); None for any."""
+    if value is None or value.strip() == "*":
+        return None
+    try:
+        return int(value.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match must be a note revision")
+
+def rerender_note(note_id: int, operations: list, with_pdf: bool, job: str,
+                  if_match: int | None = None) -> tuple[io.BytesIO, bool, int]:
+    """Re-render a note in place from its patched payload; returns (docx, pdf_stale, revision)."""
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + NOTE_EDIT_WAIT_SECONDS
+    while not shared_store.acquire_lease(f"note-edit:{note_id}", owner, NOTE_EDIT_LEASE_SECONDS):
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=409, detail=f"Note {note_id} is being edited; retry after that edit")
+        time.sleep(0.1)
+    try:
+        return _rerender_note(note_id, operations, with_pdf, job, if_match)
+    finally:
+        shared_store.release_lease(f"note-edit:{note_id}", owner)
+
+def _rerender_note(note_id: int, operations: list, with_pdf: bool, job: str, if_match: int | None):
+    started = app_logging.timer()
+    note = notes_index.get_note(note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail=f"Note {note_id} not found")
+    stored = notes_index.get_payload(note_id)
+    if not stored:
+        raise HTTPException(status_code=409, detail="Note predates stored payloads; regenerate it with /generate-doc")
+    if not note["docx_path"]:
+        raise HTTPException(status_code=410, detail="Note has been archived")
+    if if_match is not None and if_match != stored["revision"]:
+        raise HTTPException(status_code=412, detail=f"Note {note_id} is at revision {stored['revision']}, not {if_match}")
 
-        print(f"📤 Triggering upload for file: {file_name} from {path_choice}")
+    try:
+        patched = json_patch.apply_patch(stored["payload"], operations)
+    except json_patch.JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid patch: {e}")
+    try:
+        payload, template_fields = FollowUpPayload.model_validate(patched), {}
+    except ValidationError as e:
+        payload, template_fields = _with_template_fields(patched, e)
+    data = {**payload.model_dump(), **template_fields}
+    # Compared after patching, so whole-document replaces, moves and copies are caught too
+    if any(data[field] != stored["payload"].get(field) for field in IMMUTABLE_FIELDS):
+        raise HTTPException(status_code=422, detail=f"{' and '.join(IMMUTABLE_FIELDS)} cannot be patched")
+    try:
+        template = template_registry.resolve(data["templateId"], data["physician"])
+    except template_registry.UnknownTemplate:
+        raise HTTPException(status_code=422, detail=f"Unknown templateId: {data['templateId']}")
+    data["templateId"] = template["id"]
+    problems = template_registry.mismatch(
+        template_registry.variables(template), data, payload.model_fields_set | template_fields.keys(),
+    )
+    if problems:
+        raise HTTPException(status_code=422, detail=_mismatch_detail(template, problems))
+
+    job_progress.emit(job, "generate.rendering", noteId=note_id, templateId=template["id"])
+    doc = load_template(template)
+    doc.render(data)
+    docx_path = note["docx_path"]
+    docx_bytes = save_docx(doc, docx_path)
+    log_event("note.rerendered", route="/notes/{id}", note_id=note_id, elapsed_ms=app_logging.elapsed_ms(started))
+
+    pdf_path = note["pdf_path"] or f"{os.path.splitext(docx_path)[0]}.pdf"
+    pdf_converted = False
+    if with_pdf:
+        job_progress.emit(job, "generate.converting", noteId=note_id)
+        pdf_converted = _try_convert(doc, docx_path, pdf_path, "/notes/{id}", started)
+
+    job_progress.emit(job, "generate.indexing", noteId=note_id, pdfConverted=pdf_converted)
+    notes_index.update_rendered(
+        note_id,
+        patient_name=data["patientName"],
+        date_of_evaluation=data["dateOfEvaluation"],
+        template_version=notes_index.template_version(template["path"]),
+        docx_sha256=notes_index.sha256_bytes(docx_bytes),
+        docx_size=len(docx_bytes),
+        pdf_path=pdf_path if pdf_converted else None,
+        pdf_sha256=notes_index.sha256_file(pdf_path) if pdf_converted else None,
+        pdf_size=os.path.getsize(pdf_path) if pdf_converted else None,
+    )
+    revision = notes_index.save_payload(note_id, data, pdf_rendered=pdf_converted, expected_revision=stored["revision"])
+    if revision is None:
+        # Only reachable if the edit outlived its lease
+        raise HTTPException(status_code=409, detail=f"Note {note_id} was changed by another edit; re-apply the patch")
+    note_search.index_rendered_note(note_id, docx_bytes, data)
+    job_progress.emit(job, "generate.done", noteId=note_id)
+
+    return io.BytesIO(docx_bytes), not pdf_converted, revision
+
+@app.patch("/notes/{note_id}")
+async def patch_note(note_id: int, request: Request, pdf: bool = True):
+    """
+    Apply an RFC 6902 patch and re-render; ?pdf=false returns the DOCX without reconverting.
+    If-Match: <revision> (from X-Note-Revision) rejects the patch with 412 if the note changed since.
+    """
+    try:
+        operations = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        return OrjsonResponse(status_code=400, content={"error": "Body must be a JSON Patch array"})
+    if not isinstance(operations, list):
+        return OrjsonResponse(status_code=400, content={"error": "Body must be a JSON Patch array"})
+
+    job_id = job_progress.job_id_from(request.headers.get("x-job-id"))
+    job = job_progress.job_key(session_scope(request), job_id)
+    try:
+        if_match = _if_match_revision(request.headers.get("if-match"))
+        async with admission.generate_gate.admit():
+            file_stream, pdf_stale, revision = await async_io.run_io(
+                rerender_note, note_id, operations, pdf, job, if_match,
+            )
+    except ValidationError as e:
+        job_progress.emit(job, "generate.failed", error="invalid payload")
+        return OrjsonResponse(status_code=422, content={"error": "Invalid payload", "fields": validation_detail(e)})
+    except HTTPException as e:
+        job_progress.emit(job, "generate.failed", error=e.detail)
+        raise
 
-        # Run selenium uploader with single path
-        subprocess.Popen([sys.executable, "selenium_uploader.py", file_name, base_path])
+    headers = {
+        'X-Note-Id': str(note_id),
+        'X-Job-Id': job_id,
+        'X-PDF-Stale': 'true' if pdf_stale else 'false',
+        'X-Note-Revision': str(revision),
+    }
+    return StreamingResponse(file_stream, media_type=NOTE_MEDIA_TYPES["docx"], headers=headers)
+
+# --- Day Export (streamed ZIP) ---
+EXPORT_CHUNK_SIZE = 256 * 1024
+
+def _iter_file(path: str):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(EXPORT_CHUNK_SIZE), b""):
+            yield chunk
+
+def _export_members(folder: str):
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not name.lower().endswith((".docx", ".pdf")) or name.startswith("~$"):
+                continue
+            path = os.path.join(dirpath, name)
+            info = zipfile.ZipInfo.from_file(path, arcname=os.path.relpath(path, folder))
+            # DOCX and PDF are already compressed; store them as-is
+            info.compress_type = zipfile.ZIP_STORED
+            yield info, _iter_file(path)
+
+@app.get("/exports/{export_date}.zip")
+def export_day(export_date: str):
+    for fmt in ("%Y-%m-%d", "%m-%d-%Y"):
+        try:
+            day = datetime.strptime(export_date, fmt).date()
+            break
+        except ValueError:
+            continue
+    else:
+        raise HTTPException(status_code=400, detail="Date must be YYYY-MM-DD or MM-DD-YYYY")
+
+    folder = settings.day_folder(day)
+    if not os.path.isdir(folder):
+        raise HTTPException(status_code=404, detail=f"No notes for {day.isoformat()}")
+
+    headers = {"Content-Disposition": f'attachment; filename="PRC_{day.strftime("%m-%d-%Y")}.zip"'}
+    return StreamingResponse(iter_zip(_export_members(folder)), media_type="application/zip", headers=headers)
+
+# --- Admin Settings Routes ---
+class SettingsUpdate(BaseModel):
+    prcRoot: str | None = None
+    slimTemplate: bool | None = None
+
+@app.get("/admin/settings")
+def get_settings():
+    current = settings.load_settings()
+    return {**current, "today_folder": settings.day_folder()}
+
+@app.put("/admin/settings")
+def put_settings(update: SettingsUpdate):
+    prc_root = update.prcRoot.strip() if update.prcRoot else None
+    if update.prcRoot is not None and not prc_root:
+        raise HTTPException(status_code=400, detail="prcRoot cannot be empty")
+
+    current = settings.update_settings(prc_root=prc_root, slim_template=update.slimTemplate)
+    log_event("settings.updated", route="/admin/settings", prc_root=current["prc_root"],
+              slim_template=current["slim_template"])
+    return {**current, "today_folder": settings.day_folder()}
+
+# --- Disk I/O Metrics ---
+@app.get("/admin/io")
+def get_io_metrics():
+    return async_io.metrics()
+
+@app.get("/admin/render-cache")
+def get_render_cache_metrics():
+    import fragment_cache
+
+    return {"enabled": fragment_cache.enabled, **fragment_cache.metrics()}
+
+# --- Admission Control ---
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    log_event("admission.rejected", route=request.url.path, level=logging.WARNING,
+              gate=exc.gate, retry_after=exc.retry_after)
+    return OrjsonResponse(
+        status_code=429,
+        content={"error": "Server is busy, please retry shortly", "retryAfter": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
-        return {"message": f"Upload triggered for '{file_name}' from {path_choice}."}
+@app.get("/admin/admission")
+def get_admission_metrics():
+    return admission.metrics()
 
-    except HTTPException as e:
-        print(f"❌ HTTP Error: {e.detail}")
-        return JSONResponse(status_code=e.status_code, content={"error": e.detail})
+# --- Retention Routes ---
+@app.get("/admin/retention")
+def get_retention():
+    return {"policy": retention.policy(), "last_report": retention.last_report}
 
-    except Exception as e:
-        print(f"❌ Failed to start selenium_uploader.py: {e}")
-        return JSONResponse(status_code=500, content={"error": str(e)})
+@app.post("/admin/retention/run")
+def run_retention():
+    retention.run_in_background()
+    return {"message": "Retention pass started"}
 
 # --- /last-file-name Endpoint (For debugging or use cases) ---
 @app.get("/last-file-name")
-def get_last_file_name():
-    return {"last_used_file": file_name_storage.get("last_used"), "last_uploaded_file": file_name_storage.get("last_uploaded")}
+def get_last_file_name(request: Request):
+    state = shared_store.get_all(session_scope(request))
+    return {"last_used_file": state.get("last_used"), "last_uploaded_file": state.get("last_uploaded")}
+
+# --- Readiness (load balancers route traffic only once this returns 200) ---
+@app.get("/ready")
+def get_ready():
+    ready, subsystems = readiness.report()
+    return OrjsonResponse(status_code=200 if ready else 503, content={"ready": ready, "subsystems": subsystems})
 
 # --- Health Check ---
 @app.get("/")
@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import zlib
+import shutil
+import hashlib
+import zipfile
+
+import settings
+import notes_index
+from zipstream import iter_zip
+
+# --- Constants ---
+# Under data/: a top-level "archive" is the tracked Archive/ folder on case-insensitive Windows
+ARCHIVE_DIR = "data/archive"
+BLOB_DIR = os.path.join(ARCHIVE_DIR, "blobs")
+MANIFEST_DIR = os.path.join(ARCHIVE_DIR, "manifests")
+PDF_DIR = os.path.join(ARCHIVE_DIR, "pdf")
+
+CHUNK_SIZE = 64 * 1024
+# Where earlier versions kept the archive; move_legacy_archive() brings it over once
+LEGACY_ARCHIVE_DIR = "archive"
+
+
+# --- Blob Store ---
+def _blob_path(digest: str) -> str:
+    return os.path.join(BLOB_DIR, digest[:2], digest)
+
+
+def _put_blob(data: bytes) -> tuple[str, bool]:
+    """Store a member once by content hash. Returns (digest, newly_written)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return digest, False
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.compress(data, 9))
+    os.replace(tmp_path, path)
+    return digest, True
+
+
+def _iter_blob(digest: str):
+    decompressor = zlib.decompressobj()
+    with open(_blob_path(digest), "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def archive_key(path: str) -> str:
+    """
+    Archive name for a note file: its path below the PRC root (or the working directory),
+    without the extension. Notes are named after the patient, so the day folder is what
+    keeps one patient's notes apart.
+    """
+    path = os.path.abspath(path)
+    relative = os.path.splitdrive(path)[1].lstrip("\\/")
+    for root in (settings.load_settings()["prc_root"], os.getcwd()):
+        root = os.path.abspath(root)
+        try:
+            if os.path.commonpath([root, path]) == root:
+                relative = os.path.relpath(path, root)
+                break
+        except ValueError:
+            # Different drives
+            continue
+    return os.path.splitext(relative)[0].replace("\\", "/")
+
+
+def _manifest_path(name: str) -> str:
+    return os.path.join(MANIFEST_DIR, *name.split("/")) + ".json"
+
+
+def pdf_path(name: str) -> str:
+    return os.path.join(PDF_DIR, *name.split("/")) + ".pdf"
+
+
+def move_legacy_archive():
+    """Move blobs, manifests and PDFs from LEGACY_ARCHIVE_DIR unless ARCHIVE_DIR already has them."""
+    if not LEGACY_ARCHIVE_DIR:
+        return
+    for old, new in ((os.path.join(LEGACY_ARCHIVE_DIR, "blobs"), BLOB_DIR),
+                     (os.path.join(LEGACY_ARCHIVE_DIR, "manifests"), MANIFEST_DIR),
+                     (os.path.join(LEGACY_ARCHIVE_DIR, "pdf"), PDF_DIR)):
+        if os.path.isdir(old) and not os.path.exists(new):
+            os.makedirs(os.path.dirname(new), exist_ok=True)
+            shutil.move(old, new)
+
+
+# --- Archive / Restore ---
+def archive_docx(docx_path: str, name: str | None = None) -> dict:
+    """Split a DOCX into content-addressed members and write its manifest under archive_key()."""
+    name = name or archive_key(docx_path)
+    members = []
+    new_bytes = 0
+
+    with zipfile.ZipFile(docx_path) as zf:
+        for info in zf.infolist():
+            data = zf.read(info)
+            digest, is_new = _put_blob(data)
+            if is_new:
+                new_bytes += os.path.getsize(_blob_path(digest))
+            members.append({
+                "name": info.filename,
+                "sha256": digest,
+                "size": info.file_size,
+                "date_time": list(info.date_time),
+                "compress_type": info.compress_type,
+            })
+
+    manifest = {"name": name, "source_size": os.path.getsize(docx_path), "members": members}
+    os.makedirs(os.path.dirname(_manifest_path(name)), exist_ok=True)
+    with open(_manifest_path(name), "w") as f:
+        json.dump(manifest, f)
+
+    manifest["new_bytes"] = new_bytes
+    return manifest
+
+
+def archive_pdf(source_path: str, name: str | None = None) -> dict:
+    """PDFs are already compressed; they are copied as-is under archive_key()."""
+    name = name or archive_key(source_path)
+    target = pdf_path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(source_path, target)
+    return {"name": name, "new_bytes": os.path.getsize(target)}
+
+
+def load_manifest(name: str) -> dict:
+    with open(_manifest_path(name), "r") as f:
+        return json.load(f)
+
+
+def iter_docx(name: str):
+    """Rebuild an archived DOCX as a stream of bytes."""
+    manifest = load_manifest(name)
+
+    def members():
+        for member in manifest["members"]:
+            info = zipfile.ZipInfo(member["name"], date_time=tuple(member["date_time"]))
+            info.compress_type = member["compress_type"]
+            info.file_size = member["size"]
+            yield info, _iter_blob(member["sha256"])
+
+    return iter_zip(members())
+
+
+def restore_docx(name: str, out_path: str):
+    with open(out_path, "wb") as f:
+        for chunk in iter_docx(name):
+            f.write(chunk)
+
+
+def archive_folder(folder: str, remove_originals: bool = False) -> dict:
+    source_bytes = stored_bytes = count = 0
+
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.lower().endswith(".docx") or entry.name.startswith("~$"):
+            continue
+
+        manifest = archive_docx(entry.path)
+        source_bytes += manifest["source_size"]
+        stored_bytes += manifest["new_bytes"] + os.path.getsize(_manifest_path(manifest["name"]))
+        count += 1
+
+        if remove_originals:
+            os.remove(entry.path)
+            notes_index.clear_path(entry.path, archived_as=manifest["name"])
+
+    return {"files": count, "source_bytes": source_bytes, "stored_bytes": stored_bytes}
+
+
+# --- CLI ---
+if __name__ == "__main__":
+    usage = (
+        "Usage:\n"
+        "  python note_archive.py archive <folder> [--remove-originals]\n"
+        "  python note_archive.py restore <name> <out.docx>"
+    )
+    if len(sys.argv) >= 3 and sys.argv[1] == "archive":
+        stats = archive_folder(sys.argv[2], remove_originals="--remove-originals" in sys.argv)
+        ratio = stats["source_bytes"] / stats["stored_bytes"] if stats["stored_bytes"] else 0
+        print(
+            f"📦 Archived {stats['files']} files: {stats['source_bytes']:,} bytes -> "
+            f"{stats['stored_bytes']:,} new bytes stored ({ratio:.1f}x)"
+        )
+    elif len(sys.argv) == 4 and sys.argv[1] == "restore":
+        restore_docx(sys.argv[2], sys.argv[3])
+        print(f"✅ Restored: {sys.argv[3]}")
+    else:
+        print(usage)
+        sys.exit(1)
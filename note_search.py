@@ -0,0 +1,107 @@
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+
+from lxml import etree
+
+import notes_index
+
+# --- Constants ---
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+TEXT_PARTS = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+GENERATED_DIR = "generated"
+SEARCH_TOKEN = re.compile(r"[^\s\"]+")
+
+
+# --- Text Extraction ---
+def extract_text(docx) -> str:
+    """Paragraph text of the body, headers and footers; `docx` is a path or bytes."""
+    source = io.BytesIO(docx) if isinstance(docx, (bytes, bytearray)) else docx
+    paragraphs = []
+    with zipfile.ZipFile(source) as zf:
+        for name in zf.namelist():
+            if not TEXT_PARTS.match(name):
+                continue
+            root = etree.fromstring(zf.read(name))
+            for p in root.iter(f"{{{W_NS}}}p"):
+                text = "".join(t.text or "" for t in p.iter(f"{{{W_NS}}}t")).strip()
+                if text:
+                    paragraphs.append(text)
+    return "\n".join(paragraphs)
+
+
+def flatten_fields(data, prefix: str = "") -> str:
+    """Structured payload values as 'key: value' lines for the FTS `fields` column."""
+    lines = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            lines.append(flatten_fields(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for value in data:
+            lines.append(flatten_fields(value, prefix))
+    elif data not in (None, ""):
+        lines.append(f"{prefix.rstrip('.')}: {data}")
+    return "\n".join(line for line in lines if line)
+
+
+# --- Indexing ---
+def index_rendered_note(note_id: int, docx_bytes: bytes, data: dict):
+    notes_index.set_note_text(
+        note_id,
+        patient_name=data.get("patientName"),
+        date_of_evaluation=data.get("dateOfEvaluation"),
+        file_name=data.get("fileName"),
+        fields=flatten_fields(data),
+        body=extract_text(docx_bytes),
+    )
+
+
+def backfill(folder: str = GENERATED_DIR) -> int:
+    """One-off: index DOCX files that were generated before the notes index existed."""
+    count = 0
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.name.lower().endswith(".docx") or entry.name.startswith("~$"):
+            continue
+        if notes_index.is_indexed(entry.path):
+            continue
+
+        with open(entry.path, "rb") as f:
+            docx_bytes = f.read()
+        file_name = os.path.splitext(entry.name)[0]
+
+        note_id = notes_index.add_note(
+            file_name=file_name,
+            patient_name=None,
+            date_of_evaluation=None,
+            template_version=None,
+            docx_path=entry.path,
+            docx_sha256=notes_index.sha256_bytes(docx_bytes),
+            docx_size=len(docx_bytes),
+        )
+        notes_index.set_note_text(note_id, None, None, file_name, "", extract_text(docx_bytes))
+        count += 1
+    # Retention only deletes unindexed files as orphans once a backfill has run
+    notes_index.set_meta("backfilled_at", str(time.time()))
+    return count
+
+
+# --- Search ---
+def to_match_query(q: str) -> str:
+    # Quote every term so user input like "L4-L5" is a phrase, not FTS5 syntax
+    return " ".join(f'"{token}"' for token in SEARCH_TOKEN.findall(q))
+
+
+def search(q: str, limit: int = 20):
+    match = to_match_query(q)
+    if not match:
+        return []
+    return notes_index.search_notes(match, limit=limit)
+
+
+# --- CLI ---
+if __name__ == "__main__":
+    folder = sys.argv[1] if len(sys.argv) > 1 else GENERATED_DIR
+    print(f"🔎 Indexed {backfill(folder)} notes from {folder}")
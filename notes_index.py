@@ -0,0 +1,339 @@
+import os
+import time
+import sqlite3
+import hashlib
+from contextlib import closing
+from datetime import datetime
+
+import orjson
+
+import settings
+
+# --- Constants ---
+NOTES_DB_FILE = "data/notes.db"
+
+UPLOAD_NOT_UPLOADED = "not_uploaded"
+UPLOAD_QUEUED = "queued"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL,
+    patient_name TEXT,
+    date_of_evaluation TEXT,
+    template_version TEXT,
+    docx_path TEXT,
+    docx_sha256 TEXT,
+    docx_size INTEGER,
+    pdf_path TEXT,
+    pdf_sha256 TEXT,
+    pdf_size INTEGER,
+    -- note_archive names, set when retention moves a file into the archive
+    docx_archive TEXT,
+    pdf_archive TEXT,
+    upload_state TEXT NOT NULL DEFAULT 'not_uploaded',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notes_file_name ON notes (file_name);
+CREATE INDEX IF NOT EXISTS idx_notes_patient_name ON notes (patient_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_notes_date_of_evaluation ON notes (date_of_evaluation);
+CREATE INDEX IF NOT EXISTS idx_notes_pdf_path ON notes (pdf_path);
+CREATE INDEX IF NOT EXISTS idx_notes_docx_path ON notes (docx_path);
+-- Validated render payload per note; the PDF is current when pdf_revision = revision
+CREATE TABLE IF NOT EXISTS note_payloads (
+    note_id INTEGER PRIMARY KEY,
+    payload BLOB NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 1,
+    pdf_revision INTEGER,
+    updated_at TEXT NOT NULL
+);
+-- tracked_since: when this index started recording notes; backfilled_at: last note_search backfill
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    patient_name, date_of_evaluation, file_name, fields, body,
+    tokenize = 'porter unicode61'
+);
+"""
+
+_schema_ready = False
+_template_versions = {}
+
+
+# --- Connection ---
+def _connect():
+    global _schema_ready
+    os.makedirs(os.path.dirname(NOTES_DB_FILE), exist_ok=True)
+    conn = sqlite3.connect(NOTES_DB_FILE, timeout=5)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        # WAL so several uvicorn workers can read while one writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _migrate(conn)
+        _schema_ready = True
+    return conn
+
+
+def _migrate(conn):
+    # Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(notes)")}
+    for column in ("docx_archive", "pdf_archive"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE notes ADD COLUMN {column} TEXT")
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('tracked_since', ?)", (str(time.time()),))
+    # Dates used to be stored as the client sent them; rows that parse are rewritten as ISO once
+    if not conn.execute("SELECT 1 FROM meta WHERE key = 'dates_iso'").fetchone():
+        for row in conn.execute("SELECT id, date_of_evaluation FROM notes WHERE date_of_evaluation IS NOT NULL").fetchall():
+            try:
+                iso = iso_date(row["date_of_evaluation"])
+            except ValueError:
+                continue
+            conn.execute("UPDATE notes SET date_of_evaluation = ? WHERE id = ?", (iso, row["id"]))
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dates_iso', ?)", (_now(),))
+    conn.commit()
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def iso_date(value) -> str | None:
+    """Evaluation dates are stored and queried as YYYY-MM-DD, whatever format the client used."""
+    if value is None:
+        return None
+    return settings.parse_evaluation_date(value).isoformat()
+
+
+# --- Hash Helpers ---
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def template_version(template_path: str) -> str:
+    """Short content hash of the template, cached per (mtime, size)."""
+    stat = os.stat(template_path)
+    key = (template_path, stat.st_mtime_ns, stat.st_size)
+    if key not in _template_versions:
+        _template_versions[key] = sha256_file(template_path)[:12]
+    return _template_versions[key]
+
+
+# --- Writes ---
+def add_note(file_name, patient_name, date_of_evaluation, template_version,
+             docx_path, docx_sha256, docx_size,
+             pdf_path=None, pdf_sha256=None, pdf_size=None) -> int:
+    now = _now()
+    with closing(_connect()) as conn, conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO notes (
+                file_name, patient_name, date_of_evaluation, template_version,
+                docx_path, docx_sha256, docx_size, pdf_path, pdf_sha256, pdf_size,
+                upload_state, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (file_name, patient_name, iso_date(date_of_evaluation), template_version,
+             docx_path, docx_sha256, docx_size, pdf_path, pdf_sha256, pdf_size,
+             UPLOAD_NOT_UPLOADED, now, now),
+        )
+        return cursor.lastrowid
+
+
+def set_upload_state(note_id: int, state: str):
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE notes SET upload_state = ?, updated_at = ? WHERE id = ?",
+            (state, _now(), note_id),
+        )
+
+
+def set_upload_state_by_pdf_path(pdf_path: str, state: str):
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "UPDATE notes SET upload_state = ?, updated_at = ? WHERE pdf_path = ?",
+            (state, _now(), pdf_path),
+        )
+
+
+def update_rendered(note_id: int, patient_name, date_of_evaluation, template_version, docx_sha256, docx_size,
+                    pdf_path=None, pdf_sha256=None, pdf_size=None):
+    """Record a re-render in place. A new PDF also resets the upload state."""
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            """
+            UPDATE notes SET patient_name = ?, date_of_evaluation = ?, template_version = ?,
+                docx_sha256 = ?, docx_size = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (patient_name, iso_date(date_of_evaluation), template_version, docx_sha256, docx_size, _now(), note_id),
+        )
+        if pdf_path:
+            conn.execute(
+                """
+                UPDATE notes SET pdf_path = ?, pdf_sha256 = ?, pdf_size = ?, upload_state = ?
+                WHERE id = ?
+                """,
+                (pdf_path, pdf_sha256, pdf_size, UPLOAD_NOT_UPLOADED, note_id),
+            )
+
+
+def save_payload(note_id: int, payload: dict, pdf_rendered: bool, expected_revision: int | None = None) -> int | None:
+    """
+    Store the payload a note was rendered from, bumping its revision on every re-render.
+    Returns the new revision, or None if `expected_revision` is no longer the stored one.
+    """
+    with closing(_connect()) as conn, conn:
+        updated = conn.execute(
+            """
+            INSERT INTO note_payloads (note_id, payload, revision, pdf_revision, updated_at)
+            VALUES (?, ?, 1, CASE WHEN ? THEN 1 END, ?)
+            ON CONFLICT (note_id) DO UPDATE SET
+                payload = excluded.payload,
+                revision = revision + 1,
+                pdf_revision = CASE WHEN ? THEN revision + 1 ELSE pdf_revision END,
+                updated_at = excluded.updated_at
+            WHERE ? IS NULL OR note_payloads.revision = ?
+            """,
+            (note_id, orjson.dumps(payload), pdf_rendered, _now(), pdf_rendered, expected_revision, expected_revision),
+        ).rowcount
+        if not updated:
+            return None
+        return conn.execute("SELECT revision FROM note_payloads WHERE note_id = ?", (note_id,)).fetchone()["revision"]
+
+
+def set_note_text(note_id: int, patient_name, date_of_evaluation, file_name, fields: str, body: str):
+    """Full-text row for a note; the FTS rowid is the note id."""
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (note_id,))
+        conn.execute(
+            """
+            INSERT INTO notes_fts (rowid, patient_name, date_of_evaluation, file_name, fields, body)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (note_id, patient_name or "", date_of_evaluation or "", file_name or "", fields, body),
+        )
+
+
+def clear_path(path: str, archived_as: str | None = None):
+    """Forget a local file that has been removed; `archived_as` is its note_archive name, if kept."""
+    now = _now()
+    with closing(_connect()) as conn, conn:
+        for kind in ("docx", "pdf"):
+            conn.execute(
+                f"UPDATE notes SET {kind}_path = NULL, {kind}_archive = COALESCE(?, {kind}_archive), updated_at = ? "
+                f"WHERE {kind}_path = ?",
+                (archived_as, now, path),
+            )
+
+
+def set_meta(key: str, value: str):
+    with closing(_connect()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+# --- Lookups ---
+def get_meta(key: str) -> str | None:
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def tracked_since() -> float:
+    """Files older than this were written before the index existed; not being indexed says nothing about them."""
+    return float(get_meta("tracked_since") or time.time())
+
+
+def get_note(note_id: int):
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM notes WHERE id = ?", (note_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_payload(note_id: int):
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT * FROM note_payloads WHERE note_id = ?", (note_id,)).fetchone()
+    if not row:
+        return None
+    return {**dict(row), "payload": orjson.loads(row["payload"])}
+
+
+def pdf_is_stale(note_id: int) -> bool:
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT revision, pdf_revision FROM note_payloads WHERE note_id = ?", (note_id,)
+        ).fetchone()
+    return row is not None and row["pdf_revision"] != row["revision"]
+
+
+def is_indexed(path: str) -> bool:
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM notes WHERE docx_path = ? OR pdf_path = ? LIMIT 1",
+            (path, path),
+        ).fetchone()
+    return row is not None
+
+
+def note_id_for_pdf(pdf_path: str) -> int | None:
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT id FROM notes WHERE pdf_path = ? ORDER BY id DESC LIMIT 1",
+            (pdf_path,),
+        ).fetchone()
+    return row["id"] if row else None
+
+
+def find_latest_by_file_name(file_name: str):
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT * FROM notes WHERE file_name = ? ORDER BY id DESC LIMIT 1",
+            (file_name,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def search_notes(match: str, limit: int = 20):
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            """
+            SELECT n.id, n.patient_name, n.date_of_evaluation, n.file_name, n.upload_state,
+                   snippet(notes_fts, 4, '[', ']', '…', 16) AS snippet
+            FROM notes_fts
+            JOIN notes n ON n.id = notes_fts.rowid
+            WHERE notes_fts MATCH ?
+            ORDER BY bm25(notes_fts)
+            LIMIT ?
+            """,
+            (match, limit),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def find_notes(patient_name: str | None = None, date_of_evaluation: str | None = None, limit: int = 100):
+    clauses, params = [], []
+    if patient_name:
+        clauses.append("patient_name = ? COLLATE NOCASE")
+        params.append(patient_name)
+    if date_of_evaluation:
+        clauses.append("date_of_evaluation = ?")
+        params.append(iso_date(date_of_evaluation))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM notes {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+    return [dict(r) for r in rows]
@@ -0,0 +1,168 @@
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+import settings
+
+
+def known_date(value: str | None) -> str | None:
+    """Field validator: a date settings.parse_evaluation_date understands; None stays None."""
+    if value is not None:
+        settings.parse_evaluation_date(value)
+    return value
+
+
+# --- Base Model ---
+class StrictModel(BaseModel):
+    # Strict types and no unknown keys: a misspelled field is an error, not an empty line in the note
+    model_config = ConfigDict(strict=True, extra="forbid")
+
+
+# --- Signature Block ({{signature.*}}) ---
+class SignatureBlock(StrictModel):
+    otherPlans: str = ""
+    formattedLines: str = ""
+    followUpAppointment: str = ""
+    signatureLine: str = ""
+    dateTranscribed: str = ""
+
+
+# --- /generate-doc Payload ---
+# Flat render context sent by the frontend. Sections follow templates/Template.json;
+# each field is a placeholder in FU_TEMPLATE_Klickovich.docx.
+class FollowUpPayload(StrictModel):
+    fileName: str = ""
+    docSections: list[Any] = Field(default_factory=list)
+    # Template selection (see template_registry.py): explicit id, else the physician's, else the default
+    templateId: str = ""
+
+    # patient_info
+    patientName: str
+    dob: str = ""
+    dateOfEvaluation: str
+    physician: str = ""
+
+    # provider_info
+    provider: str = ""
+    referringPhysician: str = ""
+    insuranceList: str = ""
+    location: str = ""
+    CMA: str = ""
+    roomNumber: str = ""
+
+    # chief_complaint
+    chiefComplaint: str = ""
+    establishedComplaints: str = ""
+    earlier_followups: str = ""
+    INJECTION_SUMMARY: str = ""
+
+    # history_of_present_illness
+    intervalComments: str = ""
+    pain_illnessLevel: str = ""
+    activity_illnessLevel: str = ""
+    social_illnessLevel: str = ""
+    job_illnessLevel: str = ""
+    sleep_illnessLevel: str = ""
+
+    # pain_characteristics
+    temporally: str = ""
+    qualitativePain: str = ""
+    numericScaleFormatted: str = ""
+
+    # social_history
+    workingStatus: str = ""
+
+    # review_of_systems
+    allergic_symptom_1: str = ""
+    allergic_symptom_2: str = ""
+    allergic_symptom_3: str = ""
+    allergic_symptom_4: str = ""
+    allergic_symptom_5: str = ""
+    neurological_symptom_1: str = ""
+    neurological_symptom_2: str = ""
+    neurological_symptom_3: str = ""
+    neurological_symptom_4: str = ""
+    neurological_symptom_5: str = ""
+
+    # treatment_compliance
+    tox_count_yes: str = ""
+    tox_count_no: str = ""
+    tox_count_na: str = ""
+    tox_count_comment: str = ""
+    kasper_yes: str = ""
+    kasper_no: str = ""
+    kasper_na: str = ""
+    kasper_comment: str = ""
+    pt_yes: str = ""
+    pt_no: str = ""
+    pt_na: str = ""
+    pt_comment: str = ""
+    imaging_yes: str = ""
+    imaging_no: str = ""
+    imaging_na: str = ""
+    imaging_comment: str = ""
+    weightloss_yes: str = ""
+    weightloss_no: str = ""
+    weightloss_na: str = ""
+    weightloss_comment: str = ""
+    counselor_yes: str = ""
+    counselor_no: str = ""
+    counselor_na: str = ""
+    counselor_comment: str = ""
+    complianceComments: str = ""
+    nonComplianceSeverity: str = ""
+    actionTaken: str = ""
+    comments: str = ""
+
+    # physical_exam
+    vitals: str = ""
+    generalAppearance: str = ""
+    orientation: str = ""
+    moodAffect: str = ""
+    gait: str = ""
+    stationStance: str = ""
+    cardiovascular: str = ""
+    lymphadenopathy: str = ""
+    coordinationBalance: str = ""
+    motorFunction: str = ""
+
+    # assessment
+    assessment_codes: str = ""
+
+    # follow_up_plan
+    medication_management: str = ""
+    pillCount: str = ""
+    udtStatus: str = ""
+    unexpectedUTox: str = ""
+    behavioralFocus: str = ""
+    ptEval: str = ""
+    imaging: str = ""
+    xrayOf: str = ""
+    referral: str = ""
+    signature: SignatureBlock = Field(default_factory=SignatureBlock)
+
+    # Picks the note's day folder, so an unreadable date is an error rather than "today"
+    _known_evaluation_date = field_validator("dateOfEvaluation")(known_date)
+
+
+# Read by the backend itself (file name, index, day folder, template choice), so a template
+# that never prints them is not dropping anything
+BACKEND_FIELDS = frozenset({"fileName", "docSections", "templateId", "patientName", "dateOfEvaluation", "physician"})
+
+
+def unknown_fields(error: ValidationError) -> set[str] | None:
+    """Top-level keys the model rejected as unknown, or None if anything else failed too."""
+    names = set()
+    for e in error.errors(include_url=False, include_input=False):
+        if e["type"] != "extra_forbidden" or len(e["loc"]) != 1:
+            return None
+        names.add(e["loc"][0])
+    return names
+
+
+def validation_detail(error: ValidationError) -> list[dict]:
+    """Field-level errors for the 422 response, without pydantic doc URLs or echoed input."""
+    return [
+        {"field": ".".join(str(part) for part in e["loc"]), "type": e["type"], "message": e["msg"]}
+        for e in error.errors(include_url=False, include_input=False)
+    ]
@@ -0,0 +1,533 @@
+"""
+Direct PDF renderer: lays out a rendered note with fpdf2, no Word or LibreOffice.
+
+The layout comes from the rendered DOCX body (paragraph runs, alignment, spacing,
+lists, the compliance table, header and footer) rather than from a separately
+maintained spec, so a template edit shows up in both outputs at once.
+
+    python pdf_render.py note.docx [note.pdf]    # render, time it and check text parity
+
+Text is set in a Unicode TrueType font when one is found (PDF_FONT, else Arial on
+Windows or DejaVu Sans on Linux). Without one the core Helvetica font only covers
+windows-1252. A character the font cannot show fails the note (UnsupportedText), so
+no PDF goes out with "?" or a gap in place of part of a patient's name.
+"""
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import Counter
+
+from fpdf import FPDF
+from lxml import etree
+
+from note_search import TEXT_PARTS
+
+# --- Constants ---
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+FONT = "helvetica"
+UNICODE_FONT = "note-unicode"
+ENCODING = "windows-1252"
+# Regular, bold, italic and bold italic files; a missing variant falls back to the regular face
+FONT_CANDIDATES = (
+    ("C:/Windows/Fonts/arial.ttf", "C:/Windows/Fonts/arialbd.ttf", "C:/Windows/Fonts/ariali.ttf", "C:/Windows/Fonts/arialbi.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-BoldOblique.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf",),
+)
+DEFAULT_SIZE = 11.0
+LINE_HEIGHT = 1.15
+TAB = "    "
+PAGE_MARK = "\x00"
+MIN_PARITY = 0.99
+TOKEN = re.compile(r"\n|[ \t]+|[^\s]+")
+MAX_WIDTHS = 50_000
+TABLE_FONT_SIZE = 9.0
+CELL_PADDING = 3.0
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def _twips(element, attr: str, default: float = 0.0) -> float:
+    if element is None or element.get(_w(attr)) is None:
+        return default
+    return int(element.get(_w(attr))) / 20
+
+
+def _on(element) -> bool:
+    return element is not None and element.get(_w("val")) not in ("0", "false", "none")
+
+
+class UnsupportedText(ValueError):
+    """The note has characters the core PDF font cannot show and no Unicode font is installed."""
+
+
+_font_files = None
+
+
+def unicode_font() -> dict | None:
+    """fpdf style -> TTF file of the Unicode font in use, or None for the core font."""
+    global _font_files
+    if _font_files is None:
+        configured = os.environ.get("PDF_FONT")
+        candidates = [(configured,)] if configured else FONT_CANDIDATES
+        _font_files = {}
+        for files in candidates:
+            if os.path.isfile(files[0]):
+                _font_files = {
+                    style: path if path and os.path.isfile(path) else files[0]
+                    for style, path in zip(("", "B", "I", "BI"), (*files, None, None, None))
+                }
+                break
+    return _font_files or None
+
+
+def _safe(text: str) -> str:
+    # Core PDF fonts cover windows-1252 only; a "?" in a patient's name must fail the PDF, not ship
+    try:
+        text.encode(ENCODING)
+    except UnicodeEncodeError as e:
+        raise UnsupportedText(
+            f"Text outside {ENCODING} (e.g. U+{ord(e.object[e.start]):04X}) needs a Unicode font; set PDF_FONT to a .ttf file"
+        ) from None
+    return text
+
+
+# --- Reading the Rendered Document ---
+class _Styles:
+    """Paragraph style defaults (size, bold) and list formats from styles/numbering parts."""
+
+    def __init__(self, document):
+        styles = document.styles.element
+        default_sz = styles.find(f"{_w('docDefaults')}/{_w('rPrDefault')}/{_w('rPr')}/{_w('sz')}")
+        self.default_size = int(default_sz.get(_w("val"))) / 2 if default_sz is not None else DEFAULT_SIZE
+        self.sizes, self.bold = {}, {}
+        for style in styles.iter(_w("style")):
+            style_id = style.get(_w("styleId"))
+            sz = style.find(f"{_w('rPr')}/{_w('sz')}")
+            if sz is not None:
+                self.sizes[style_id] = int(sz.get(_w("val"))) / 2
+            self.bold[style_id] = _on(style.find(f"{_w('rPr')}/{_w('b')}"))
+
+        self.list_formats = {}
+        try:
+            numbering = document.part.numbering_part.element
+        except (KeyError, NotImplementedError):
+            return
+        abstract = {
+            a.get(_w("abstractNumId")): {
+                lvl.get(_w("ilvl")): lvl.find(_w("numFmt")).get(_w("val"))
+                for lvl in a.iter(_w("lvl")) if lvl.find(_w("numFmt")) is not None
+            }
+            for a in numbering.iter(_w("abstractNum"))
+        }
+        for num in numbering.iter(_w("num")):
+            ref = num.find(_w("abstractNumId"))
+            if ref is not None:
+                self.list_formats[num.get(_w("numId"))] = abstract.get(ref.get(_w("val")), {})
+
+
+def _paragraph(p, styles: _Styles) -> dict:
+    ppr = p.find(_w("pPr"))
+    style_id = None
+    if ppr is not None and ppr.find(_w("pStyle")) is not None:
+        style_id = ppr.find(_w("pStyle")).get(_w("val"))
+    base_size = styles.sizes.get(style_id, styles.default_size)
+    base_bold = styles.bold.get(style_id, False)
+
+    jc = ppr.find(_w("jc")).get(_w("val")) if ppr is not None and ppr.find(_w("jc")) is not None else "left"
+    spacing = ppr.find(_w("spacing")) if ppr is not None else None
+    ind = ppr.find(_w("ind")) if ppr is not None else None
+    num = ppr.find(_w("numPr")) if ppr is not None else None
+
+    fragments, field, instr = [], None, ""
+    for r in p.iter(_w("r")):
+        rpr = r.find(_w("rPr"))
+        sz = rpr.find(_w("sz")) if rpr is not None else None
+        style = (
+            _on(rpr.find(_w("b"))) if rpr is not None and rpr.find(_w("b")) is not None else base_bold,
+            rpr is not None and _on(rpr.find(_w("i"))),
+            rpr is not None and _on(rpr.find(_w("u"))),
+            int(sz.get(_w("val"))) / 2 if sz is not None else base_size,
+        )
+        for child in r:
+            if child.tag == _w("fldChar"):
+                kind = child.get(_w("fldCharType"))
+                if kind == "begin":
+                    field, instr = "instr", ""
+                elif kind == "separate":
+                    field = "result"
+                elif kind == "end":
+                    if instr.split()[:1] == ["PAGE"]:
+                        fragments.append((PAGE_MARK, style))
+                    field = None
+            elif child.tag == _w("instrText"):
+                instr += child.text or ""
+            elif field is not None and (field == "instr" or instr.split()[:1] == ["PAGE"]):
+                continue
+            elif child.tag == _w("t"):
+                fragments.append((child.text or "", style))
+            elif child.tag == _w("tab"):
+                fragments.append((TAB, style))
+            elif child.tag == _w("br"):
+                fragments.append(("\f" if child.get(_w("type")) == "page" else "\n", style))
+
+    list_format = None
+    if num is not None and num.find(_w("numId")) is not None:
+        ilvl = num.find(_w("ilvl")).get(_w("val")) if num.find(_w("ilvl")) is not None else "0"
+        list_format = (num.find(_w("numId")).get(_w("val")), styles.list_formats.get(
+            num.find(_w("numId")).get(_w("val")), {}).get(ilvl, "bullet"))
+
+    return {
+        "align": {"both": "J", "center": "C", "right": "R"}.get(jc, "L"),
+        "before": _twips(spacing, "before"),
+        "after": _twips(spacing, "after"),
+        "indent": _twips(ind, "left"),
+        "size": base_size,
+        "list": list_format,
+        "fragments": fragments,
+    }
+
+
+def _table(tbl, styles: _Styles) -> dict:
+    widths = [int(col.get(_w("w"))) for col in tbl.iter(_w("gridCol"))]
+    rows = []
+    for tr in tbl.iter(_w("tr")):
+        row = []
+        for tc in tr.iter(_w("tc")):
+            paragraphs = [_paragraph(p, styles) for p in tc.iter(_w("p"))]
+            text = "\n".join("".join(t for t, _ in p["fragments"]) for p in paragraphs).strip()
+            bold = all(s[0] for p in paragraphs for t, s in p["fragments"] if t.strip())
+            row.append((text, bold))
+        rows.append(row)
+    return {"widths": widths, "rows": rows}
+
+
+def _part_element(document, rel_id: str):
+    # docxtpl swaps header/footer parts after rendering; read through the relationship
+    return document.part.rels[rel_id]._target.element
+
+
+def _header_footer(document, kind: str, styles: _Styles) -> list:
+    # A section without its own reference inherits the previous section's, as in Word
+    rel_id = None
+    for sect_pr in document.element.body.iter(_w("sectPr")):
+        for ref in sect_pr.iter(_w(f"{kind}Reference")):
+            if ref.get(_w("type")) == "default":
+                rel_id = ref.get(f"{{{R_NS}}}id")
+    if rel_id is None:
+        return []
+    return [_paragraph(p, styles) for p in _part_element(document, rel_id).iter(_w("p"))]
+
+
+# --- Layout ---
+# fpdf2's multi_cell/text_columns re-measure every candidate line character by character,
+# which costs hundreds of ms on a note; a greedy wrap over cached word widths is enough here.
+_widths = {}
+
+
+class _NotePDF(FPDF):
+    def __init__(self, geometry: dict, header: list, footer: list):
+        super().__init__(unit="pt", format=(geometry["width"], geometry["height"]))
+        self.core_fonts_encoding = ENCODING
+        self.font_files = unicode_font()
+        if self.font_files:
+            for style, path in self.font_files.items():
+                self.add_font(UNICODE_FONT, style, path)
+        self.geometry = geometry
+        self.header_paragraphs = header
+        self.footer_paragraphs = footer
+        self.list_counters = {}
+        self.set_margins(geometry["left"], geometry["top"], geometry["right"])
+        self.set_auto_page_break(False)
+
+    # --- Measuring and wrapping ---
+    def _font(self, style: tuple):
+        bold, italic, underline, size = style
+        self.set_font(UNICODE_FONT if self.font_files else FONT, ("B" if bold else "") + ("I" if italic else "") + ("U" if underline else ""), size)
+
+    def _measure(self, text: str, style: tuple) -> float:
+        key = (text, style[0], style[1], style[3])
+        width = _widths.get(key)
+        if width is None:
+            if len(_widths) > MAX_WIDTHS:
+                _widths.clear()
+            self._font(style)
+            width = _widths[key] = self.get_string_width(text)
+        return width
+
+    def _words(self, fragments: list) -> list:
+        """(gap width, [(text, style, width)], width) per word; None marks a line break."""
+        words, pieces, gap = [], [], 0.0
+        for text, style in fragments:
+            text = text.replace(PAGE_MARK, str(self.page_no()))
+            if not self.font_files:
+                text = _safe(text)
+            for token in TOKEN.findall(text):
+                if token == "\n" or token.isspace():
+                    if pieces:
+                        words.append((gap, pieces, sum(p[2] for p in pieces)))
+                        pieces, gap = [], 0.0
+                    if token == "\n":
+                        words.append(None)
+                    else:
+                        gap += self._measure(token, style)
+                else:
+                    pieces.append((token, style, self._measure(token, style)))
+        if pieces:
+            words.append((gap, pieces, sum(p[2] for p in pieces)))
+        return words
+
+    def _split_long(self, word: tuple, width: float) -> list:
+        # A word wider than the line (a rule of underscores) breaks by character, as in Word
+        gap, pieces, _ = word
+        text, style = "".join(p[0] for p in pieces), pieces[0][1]
+        chunks, start = [], 0
+        while start < len(text):
+            end = start + 1
+            while end < len(text) and self._measure(text[start:end + 1], style) <= width:
+                end += 1
+            chunk = text[start:end]
+            chunks.append((gap if not chunks else 0.0, [(chunk, style, self._measure(chunk, style))],
+                           self._measure(chunk, style)))
+            start = end
+        return chunks
+
+    def _wrap(self, fragments: list, width: float) -> list:
+        """Lines as (words, ends_with_break)."""
+        lines, line, used = [], [], 0.0
+        for word in self._words(fragments):
+            if word is None:
+                lines.append((line, True))
+                line, used = [], 0.0
+                continue
+            if word[2] > width:
+                split = self._split_long(word, width)
+            else:
+                split = [word]
+            for gap, pieces, w in split:
+                if line and used + gap + w > width:
+                    lines.append((line, False))
+                    line, used, gap = [], 0.0, 0.0
+                elif not line and lines and not lines[-1][1]:
+                    gap = 0.0
+                line.append((gap, pieces, w))
+                used += gap + w
+        if line or not lines:
+            lines.append((line, True))
+        return lines
+
+    # --- Drawing ---
+    def _draw_line(self, line: list, x: float, width: float, align: str, last: bool, size: float):
+        natural = sum(gap + w for gap, _, w in line)
+        gaps = sum(1 for i, (gap, _, _) in enumerate(line) if i and gap)
+        extra = 0.0
+        if align == "J" and not last and gaps:
+            extra = (width - natural) / gaps
+        elif align == "C":
+            x += (width - natural) / 2
+        elif align == "R":
+            x += width - natural
+        baseline = self.y + size * (LINE_HEIGHT - 0.2)
+        for i, (gap, pieces, _) in enumerate(line):
+            x += gap + (extra if i and gap else 0.0)
+            for text, style, w in pieces:
+                self._font(style)
+                self.text(x, baseline, text)
+                x += w
+
+    def draw_paragraph(self, p: dict, x: float, width: float, breaks: bool = True):
+        bullet = ""
+        if p["list"]:
+            num_id, fmt = p["list"]
+            self.list_counters[num_id] = self.list_counters.get(num_id, 0) + 1
+            bullet = f"{self.list_counters[num_id]}." if fmt == "decimal" else "\u2022"
+        indent = max(p["indent"], 18.0) if bullet else p["indent"]
+
+        if self.y > self.t_margin:
+            self.set_y(self.y + p["before"])
+        lines = self._wrap(p["fragments"], width - indent)
+        for i, (line, hard) in enumerate(lines):
+            size = max((s[3] for _, pieces, _ in line for _, s, _ in pieces), default=p["size"])
+            height = size * LINE_HEIGHT
+            if breaks and self.y + height > self.page_break_trigger:
+                self.add_page()
+            if bullet and i == 0:
+                self._font((False, False, False, size))
+                self.text(x + indent - 14, self.y + size * (LINE_HEIGHT - 0.2), bullet)
+            self._draw_line(line, x + indent, width - indent, p["align"], hard or i == len(lines) - 1, size)
+            self.set_y(self.y + height)
+        self.set_y(self.y + p["after"])
+
+    def draw_table(self, table: dict):
+        scale = self.epw / sum(table["widths"])
+        widths = [w * scale for w in table["widths"]]
+        height = TABLE_FONT_SIZE * LINE_HEIGHT
+        for cells in table["rows"]:
+            wrapped = [
+                self._wrap([(text, (bold, False, False, TABLE_FONT_SIZE))], w - 2 * CELL_PADDING)
+                for (text, bold), w in zip(cells, widths)
+            ]
+            row_height = max(len(lines) for lines in wrapped) * height + 2 * CELL_PADDING
+            if self.y + row_height > self.page_break_trigger:
+                self.add_page()
+            top, x = self.y, self.l_margin
+            for lines, w in zip(wrapped, widths):
+                self.rect(x, top, w, row_height)
+                self.set_y(top + CELL_PADDING)
+                for line, _ in lines:
+                    self._draw_line(line, x + CELL_PADDING, w - 2 * CELL_PADDING, "L", True, TABLE_FONT_SIZE)
+                    self.set_y(self.y + height)
+                x += w
+            self.set_y(top + row_height)
+        self.set_y(self.y + CELL_PADDING)
+
+    def header(self):
+        self.set_y(self.geometry["header"])
+        for p in self.header_paragraphs:
+            self.draw_paragraph({**p, "list": None}, self.l_margin, self.epw, breaks=False)
+        self.set_y(max(self.y, self.geometry["top"]))
+
+    def footer_height(self) -> float:
+        return sum(
+            len(self._wrap(p["fragments"], self.epw)) * p["size"] * LINE_HEIGHT
+            for p in self.footer_paragraphs
+        )
+
+    def footer(self):
+        self.set_y(self.h - self.geometry["footer"] - self.footer_height())
+        for p in self.footer_paragraphs:
+            self.draw_paragraph({**p, "list": None, "before": 0, "after": 0}, self.l_margin, self.epw, breaks=False)
+
+
+def _one_line(paragraphs: list) -> list:
+    # The footer is a one-row table (page number | patient line); lay its cells out as one paragraph
+    fragments = []
+    for p in paragraphs:
+        if p["fragments"]:
+            if fragments:
+                fragments.append(("  ", p["fragments"][0][1]))
+            fragments.extend(p["fragments"])
+    if not fragments:
+        return []
+    return [{**paragraphs[-1], "align": "L", "fragments": fragments}]
+
+
+def render_pdf(document) -> bytes:
+    """PDF bytes for a rendered python-docx Document (or a rendered DocxTemplate)."""
+    document = getattr(document, "docx", None) or document
+    styles = _Styles(document)
+    body = document.element.body
+    sect_pr = body.find(_w("sectPr"))
+    pg_sz = sect_pr.find(_w("pgSz"))
+    pg_mar = sect_pr.find(_w("pgMar"))
+    geometry = {
+        "width": _twips(pg_sz, "w", 612), "height": _twips(pg_sz, "h", 792),
+        "left": _twips(pg_mar, "left", 72), "right": _twips(pg_mar, "right", 72),
+        "top": _twips(pg_mar, "top", 72), "bottom": _twips(pg_mar, "bottom", 72),
+        "header": _twips(pg_mar, "header", 36), "footer": _twips(pg_mar, "footer", 36),
+    }
+
+    pdf = _NotePDF(
+        geometry,
+        _header_footer(document, "header", styles),
+        _one_line(_header_footer(document, "footer", styles)),
+    )
+    # A footer taller than the bottom margin pushes the body up, as in Word
+    pdf.set_auto_page_break(False, margin=max(geometry["bottom"], geometry["footer"] + pdf.footer_height() + 6))
+    pdf.add_page()
+    for element in body:
+        if element.tag == _w("p"):
+            p = _paragraph(element, styles)
+            # Hard page breaks split the paragraph
+            chunks = [[]]
+            for fragment in p["fragments"]:
+                if fragment[0] == "\f":
+                    chunks.append([])
+                else:
+                    chunks[-1].append(fragment)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    pdf.add_page()
+                if chunk or len(chunks) == 1:
+                    pdf.draw_paragraph({**p, "fragments": chunk}, pdf.l_margin, pdf.epw)
+        elif element.tag == _w("tbl"):
+            pdf.draw_table(_table(element, styles))
+    # fpdf2 only warns about characters the TTF has no glyph for, and leaves them out
+    missing = sorted({c for font in pdf.fonts.values() for c in getattr(font, "missing_glyphs", ())})
+    if missing:
+        raise UnsupportedText(f"The PDF font has no glyph for U+{missing[0]:04X} ({len(missing)} characters in all)")
+    return bytes(pdf.output())
+
+
+def write_pdf(document, pdf_path: str):
+    data = render_pdf(document)
+    with open(pdf_path, "wb") as f:
+        f.write(data)
+
+
+# --- Parity ---
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _docx_text(docx_bytes: bytes) -> str:
+    # note_search.extract_text joins runs without the tabs between them; keep them apart here
+    parts = []
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+        for name in zf.namelist():
+            if TEXT_PARTS.match(name):
+                for node in etree.fromstring(zf.read(name)).iter(_w("t"), _w("tab"), _w("br"), _w("p")):
+                    parts.append(node.text or "" if node.tag == _w("t") else " ")
+    return "".join(parts)
+
+
+def parity(docx_bytes: bytes, pdf_bytes: bytes) -> dict:
+    """Share of the DOCX's words found in the PDF's extracted text (headers repeat per page, so as a multiset)."""
+    from pypdf import PdfReader
+
+    expected = Counter(_words(_docx_text(docx_bytes)))
+    actual = Counter(_words("\n".join(page.extract_text() for page in PdfReader(io.BytesIO(pdf_bytes)).pages)))
+    missing = expected - actual
+    total = sum(expected.values())
+    return {
+        "coverage": round((total - sum(missing.values())) / max(total, 1), 4),
+        "words": total,
+        "missing": sorted(missing)[:20],
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python pdf_render.py note.docx [note.pdf]")
+        sys.exit(1)
+
+    from docx import Document
+
+    with open(sys.argv[1], "rb") as f:
+        docx_bytes = f.read()
+    document = Document(io.BytesIO(docx_bytes))
+
+    started = time.perf_counter()
+    pdf_bytes = render_pdf(document)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    out = sys.argv[2] if len(sys.argv) > 2 else re.sub(r"\.docx$", "", sys.argv[1]) + ".direct.pdf"
+    with open(out, "wb") as f:
+        f.write(pdf_bytes)
+
+    report = parity(docx_bytes, pdf_bytes)
+    print(f"📄 {out}: {len(pdf_bytes):,} bytes in {elapsed_ms:.1f} ms")
+    print(f"🔎 Text parity: {report['coverage']:.2%} of {report['words']} words")
+    for gap in report["missing"]:
+        print(f"   missing: {gap}")
+    sys.exit(0 if report["coverage"] >= MIN_PARITY else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from app_logging import error_text, log_event
+
+# --- Constants ---
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+_lock = threading.Lock()
+_subsystems = {}
+
+
+def register(name: str, required: bool = True):
+    """Declare a subsystem; required ones must be warm before /ready reports ready."""
+    with _lock:
+        _subsystems[name] = {"state": PENDING, "required": required}
+
+
+def _update(name: str, **fields):
+    with _lock:
+        _subsystems[name].update(fields)
+
+
+@contextmanager
+def warming(name: str):
+    """Time one warm-up step. A failure is recorded, not raised, so later steps still run."""
+    _update(name, state=WARMING)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        _update(name, state=FAILED, error=error_text(e), elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+        log_event("warm_up.step_failed", level=logging.WARNING, subsystem=name, error=error_text(e))
+    else:
+        _update(name, state=READY, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+
+def skip(name: str, reason: str):
+    _update(name, state=SKIPPED, reason=reason)
+
+
+def report() -> tuple[bool, dict]:
+    with _lock:
+        subsystems = {name: dict(info) for name, info in _subsystems.items()}
+    settled = all(info["state"] not in (PENDING, WARMING) for info in subsystems.values())
+    required_ready = all(info["state"] == READY for info in subsystems.values() if info["required"])
+    return settled and required_ready, subsystems
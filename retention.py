@@ -0,0 +1,199 @@
+import os
+import time
+import logging
+import uuid
+import threading
+from datetime import datetime
+
+import job_progress
+import notes_index
+import note_archive
+import settings
+import shared_store
+from app_logging import error_text, log_event
+
+# --- Constants ---
+GENERATED_DIR = "generated"
+MANAGED_EXTENSIONS = (".docx", ".pdf")
+# Copies made for the portal upload; they are never indexed, so never orphans
+UPLOAD_FOLDERS = ("path1", "path2")
+
+_run_lock = threading.Lock()
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+LEASE_SECONDS = 30 * 60
+_stop = threading.Event()
+_thread = None
+last_report = {}
+
+
+def policy() -> dict:
+    configured = settings.load_settings().get("retention") or {}
+    return {**settings.DEFAULT_SETTINGS["retention"], **configured}
+
+
+# --- Folder Discovery ---
+def _day_folders_older_than(cutoff_date):
+    """Yield PDF folders of PRC day folders dated before the cutoff, without listing newer days."""
+    root = settings.load_settings()["prc_root"]
+    if not os.path.isdir(root):
+        return
+
+    for year_dir in os.scandir(root):
+        if not year_dir.is_dir() or not year_dir.name.startswith("PRC "):
+            continue
+        for month_dir in os.scandir(year_dir.path):
+            if not month_dir.is_dir():
+                continue
+            for day_dir in os.scandir(month_dir.path):
+                try:
+                    day = datetime.strptime(day_dir.name, "%m-%d-%Y").date()
+                except ValueError:
+                    continue
+                if day < cutoff_date:
+                    # Same string construction as settings.pdf_folder, so index lookups match
+                    yield os.path.join(settings.day_folder(day), "PDF")
+
+
+def _candidate_folders(cutoff_date):
+    yield GENERATED_DIR
+    for pdf_folder in _day_folders_older_than(cutoff_date):
+        yield pdf_folder
+        for upload_folder in UPLOAD_FOLDERS:
+            yield os.path.join(pdf_folder, upload_folder)
+
+
+def _iter_files(folder):
+    if not os.path.isdir(folder):
+        return
+    for entry in os.scandir(folder):
+        if entry.is_file() and entry.name.lower().endswith(MANAGED_EXTENSIONS) and not entry.name.startswith("~$"):
+            yield entry
+
+
+# --- Actions ---
+def _archive_file(path: str) -> tuple[str, int]:
+    """Archive a file; returns its archive name and the bytes the archive grew by."""
+    if path.lower().endswith(".docx"):
+        archived = note_archive.archive_docx(path)
+    else:
+        archived = note_archive.archive_pdf(path)
+    return archived["name"], archived["new_bytes"]
+
+
+def run_once() -> dict:
+    """One retention pass; files are handled in small batches so requests are never starved."""
+    if not _run_lock.acquire(blocking=False):
+        return {"skipped": "retention already running"}
+    # Only one worker process runs a pass at a time
+    if not shared_store.acquire_lease("retention", _worker_id, LEASE_SECONDS):
+        _run_lock.release()
+        return {"skipped": "retention running in another worker"}
+
+    try:
+        rules = policy()
+        now = time.time()
+        keep_before = now - rules["keep_days"] * 86400
+        orphan_before = now - rules["orphan_grace_days"] * 86400
+        cutoff_date = datetime.fromtimestamp(orphan_before).date()
+
+        report = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "scanned": 0, "archived": 0, "deleted": 0, "deleted_orphans": 0,
+            "freed_bytes": 0, "archive_bytes": 0, "errors": 0,
+        }
+
+        # Without a backfill, "not indexed" mostly means "written before the index existed"
+        delete_orphans = rules["delete_orphans"] and notes_index.get_meta("backfilled_at") is not None
+        if rules["delete_orphans"] and not delete_orphans:
+            log_event("retention.orphans_kept", level=logging.WARNING, reason="no note_search backfill recorded")
+        tracked_since = notes_index.tracked_since()
+
+        processed = 0
+        for folder in _candidate_folders(cutoff_date):
+            if _stop.is_set():
+                break
+            upload_copies = os.path.basename(folder) in UPLOAD_FOLDERS
+            for entry in _iter_files(folder):
+                if _stop.is_set():
+                    break
+
+                report["scanned"] += 1
+                archived_as = None
+                # One unreadable or corrupt file must not stop the pass
+                try:
+                    stat = entry.stat()
+                    if stat.st_mtime >= orphan_before:
+                        continue
+
+                    indexed = notes_index.is_indexed(entry.path)
+                    expired = stat.st_mtime < keep_before
+                    orphan = (
+                        delete_orphans and not indexed and not upload_copies and stat.st_mtime >= tracked_since
+                    )
+                    if not expired and not orphan:
+                        continue
+
+                    # Only indexed notes may skip the archive; anything else is the last copy we know of
+                    if expired and (rules["archive"] or not indexed):
+                        archived_as, new_bytes = _archive_file(entry.path)
+                        report["archive_bytes"] += new_bytes
+                        report["archived"] += 1
+                    elif expired:
+                        report["deleted"] += 1
+                    else:
+                        report["deleted_orphans"] += 1
+
+                    os.remove(entry.path)
+                    report["freed_bytes"] += stat.st_size
+                    if indexed:
+                        notes_index.clear_path(entry.path, archived_as=archived_as)
+                except Exception as e:
+                    report["errors"] += 1
+                    log_event("retention.file_failed", level=logging.WARNING, error=error_text(e))
+
+                processed += 1
+                if processed % rules["batch_size"] == 0:
+                    time.sleep(0.5)
+
+        # Expired idempotency results and old job progress live in the shared store
+        report["purged_store_rows"] = shared_store.purge_expired() + shared_store.purge_events(job_progress.EVENT_TTL_SECONDS)
+
+        report["reclaimed_bytes"] = report["freed_bytes"] - report["archive_bytes"]
+        report["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        last_report.clear()
+        last_report.update(report)
+
+        log_event("retention.done", **{k: v for k, v in report.items() if k not in ("started_at", "finished_at")})
+        return report
+    finally:
+        shared_store.release_lease("retention", _worker_id)
+        _run_lock.release()
+
+
+# --- Background Scheduler ---
+def _loop():
+    while not _stop.is_set():
+        rules = policy()
+        if rules["enabled"]:
+            try:
+                run_once()
+            except Exception as e:
+                log_event("retention.failed", level=logging.ERROR, error=error_text(e))
+        _stop.wait(rules["interval_minutes"] * 60)
+
+
+def start():
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="retention", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def run_in_background():
+    threading.Thread(target=run_once, name="retention-manual", daemon=True).start()
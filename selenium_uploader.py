@@ -1,13 +1,23 @@
 import sys
 import os
+import logging
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+from upload_verifier import record_upload, verify_batch, STATUS_CONFIRMED, STATUS_RETRY, VERIFY_TIMEOUT_SECONDS
+import notes_index
+import job_progress
+import app_logging
+from app_logging import error_text, log_event
 
 # Arguments from FastAPI
 file_name = sys.argv[1]      # just the name (without .pdf)
 base_path = sys.argv[2]      # full path chosen in backend (path1 or path2)
+extra_file_names = sys.argv[3:]  # optional: more names uploaded in the same batch
+job = os.environ.get("PRC_JOB")  # progress is reported against this job, if set (job_progress.job_key)
+# Portal provider for the note's template (templates/registry.json), set by the server
+portal_provider = os.environ.get("PRC_PORTAL_PROVIDER") or "KLICKOVICH MD, ROBERT"
 
 
 def upload_document(driver, title, file_path, notes):
@@ -30,38 +40,77 @@ def upload_document(driver, title, file_path, notes):
         driver.find_element(By.NAME, "file").send_keys(os.path.abspath(file_path))
 
         Select(driver.find_element(By.NAME, "documentType")).select_by_visible_text("CONSULTS")
-        Select(driver.find_element(By.NAME, "provider")).select_by_visible_text("KLICKOVICH MD, ROBERT")
+        Select(driver.find_element(By.NAME, "provider")).select_by_visible_text(portal_provider)
 
         driver.find_element(By.NAME, "notes").send_keys(notes)
 
         # 4. Submit
         driver.find_element(By.XPATH, "//button[normalize-space()='Upload']").click()
 
-        print(f"✅ Uploaded: {os.path.basename(file_path)}")
+        log_event("upload.submitted", note_id=notes_index.note_id_for_pdf(file_path))
 
     except Exception as e:
-        print(f"❌ Upload failed: {e}")
+        log_event("upload.submit_failed", level=logging.WARNING,
+                  note_id=notes_index.note_id_for_pdf(file_path), error=error_text(e))
         raise
 
 
-def main():
-    # Always expect a .pdf
-    file_path = os.path.join(base_path, f"{file_name}.pdf")
-
-    if not os.path.exists(file_path):
-        print(f"❌ File not found: {file_path}")
-        return
+def verify(driver, batch):
+    """Mark each submitted upload confirmed or retry; returns the file paths to retry."""
+    # One read of the document list covers the batch, re-read until the new uploads show up
+    job_progress.emit(job, "upload.verifying", files=len(batch))
+    missing = {entry["file_path"] for entry in verify_batch(driver, batch, timeout=VERIFY_TIMEOUT_SECONDS)}
+    for entry in batch:
+        state = STATUS_RETRY if entry["file_path"] in missing else STATUS_CONFIRMED
+        notes_index.set_upload_state_by_pdf_path(entry["file_path"], state)
+    return missing
 
-    title = f"PDF Upload: {file_name}"
-    notes = f"Uploaded from {base_path}"
 
+def upload_batch():
+    job_progress.emit(job, "upload.starting_browser")
     # ⚠️ Update your chromedriver path
     driver = webdriver.Chrome(executable_path="/path/to/chromedriver")
 
-    # Perform upload
-    upload_document(driver, title, file_path, notes)
+    batch = []
+    try:
+        for name in [file_name, *extra_file_names]:
+            # Always expect a .pdf
+            file_path = os.path.join(base_path, f"{name}.pdf")
+
+            if not os.path.exists(file_path):
+                log_event("upload.file_missing", level=logging.WARNING,
+                          note_id=notes_index.note_id_for_pdf(file_path))
+                job_progress.emit(job, "upload.file_missing", fileName=name)
+                continue
+
+            title = f"PDF Upload: {name}"
+            notes = f"Uploaded from {base_path}"
+
+            # Perform upload
+            job_progress.emit(job, "upload.uploading", fileName=name)
+            upload_document(driver, title, file_path, notes)
+            batch.append(record_upload(title, file_path))
+    finally:
+        # A failed upload must not leave the ones already submitted unverified
+        try:
+            missing = verify(driver, batch)
+        finally:
+            driver.quit()
 
-    driver.quit()
+    job_progress.emit(job, "upload.done", confirmed=len(batch) - len(missing), retry=len(missing))
+
+
+def main():
+    # The uploader runs in its own process, so it starts its own log writer
+    app_logging.start()
+    try:
+        upload_batch()
+    except Exception as e:
+        job_progress.emit(job, "upload.failed", error=error_text(e))
+        log_event("upload.failed", level=logging.ERROR, error=error_text(e))
+        raise
+    finally:
+        app_logging.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+from datetime import date, datetime
+
+# --- Constants ---
+SETTINGS_FILE = "data/settings.json"
+
+DEFAULT_SETTINGS = {
+    # Root of the PRC share; day folders are derived below it
+    "prc_root": os.environ.get("PRC_ROOT", "F:/"),
+    # Strip revision IDs, web extensions and unused styles from templates at load time
+    "slim_template": os.environ.get("SLIM_TEMPLATE", "1") != "0",
+    # Reuse rendered body sections whose inputs match an earlier note (see fragment_cache.py)
+    "fragment_cache": os.environ.get("FRAGMENT_CACHE", "1") != "0",
+    # "docx2pdf" (Word), "direct" (fpdf2 layout, see pdf_render.py) or "auto": Word where it can exist
+    "pdf_renderer": os.environ.get("PDF_RENDERER", "auto"),
+    # Fraction of INFO log records kept per route; warnings and errors are always kept
+    "log_sampling": {"/physicians": 0.1},
+    # How long a /generate-doc Idempotency-Key replays its first result
+    "idempotency_ttl_seconds": 600,
+    # Per-worker limits for heavy work; requests beyond them get 429 + Retry-After (see admission.py)
+    "admission": {
+        "generate": {
+            "max_concurrent": int(os.environ.get("GENERATE_CONCURRENCY", "2")),
+            "max_queue": int(os.environ.get("GENERATE_QUEUE", "16")),
+            "queue_timeout_seconds": 30,
+            "retry_after_seconds": 5,
+        },
+    },
+    # Startup warm-up steps beyond template parsing and a dummy render (see /ready)
+    "warm_up": {
+        "converter": os.environ.get("WARM_CONVERTER", "1") != "0",
+        "browser": os.environ.get("WARM_BROWSER", "0") != "0",
+    },
+    # Anonymized request capture replayed by loadtest.py (see traffic_recorder.py)
+    "traffic_recording": {
+        "enabled": os.environ.get("RECORD_TRAFFIC", "0") != "0",
+        "file": "data/traffic.jsonl",
+        "routes": ["/generate-doc", "/physicians"],
+        "sample_rate": 1.0,
+    },
+    # Retention job for generated/ and the PRC PDF folders (see retention.py)
+    "retention": {
+        "enabled": True,
+        "keep_days": 30,
+        "archive": True,
+        # Delete unindexed files outright. Only honoured after a note_search.py backfill, and never
+        # for upload copies (path1/path2) or files older than the notes index; those are archived
+        "delete_orphans": False,
+        "orphan_grace_days": 7,
+        "batch_size": 200,
+        "interval_minutes": 60,
+    },
+}
+
+# Month folder names as they already exist on the share (e.g. "SEPT-2025")
+MONTH_FOLDERS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUNE", "JULY", "AUG", "SEPT", "OCT", "NOV", "DEC"]
+DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d", "%m-%d-%Y", "%m/%d/%y")
+# How often a worker re-checks the settings file for changes made by another worker
+RELOAD_CHECK_SECONDS = 1.0
+
+_lock = threading.Lock()
+_settings = None
+_settings_mtime = None
+_checked_at = 0.0
+_created_dirs = set()
+
+
+def _file_mtime():
+    try:
+        return os.stat(SETTINGS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# --- Load/Save Helpers ---
+def _load_overrides() -> dict:
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def load_settings() -> dict:
+    global _settings, _settings_mtime, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _settings is None or now - _checked_at >= RELOAD_CHECK_SECONDS:
+            _checked_at = now
+            mtime = _file_mtime()
+            if _settings is None or mtime != _settings_mtime:
+                _settings = {**DEFAULT_SETTINGS, **_load_overrides()}
+                _settings_mtime = mtime
+                _created_dirs.clear()
+        return dict(_settings)
+
+
+def update_settings(**changes) -> dict:
+    """Apply changes at runtime and persist them; other workers pick them up within a second."""
+    global _settings, _settings_mtime
+
+    with _lock:
+        # Only overrides are written; defaults (many of them from env vars) stay live
+        overrides = _load_overrides()
+        overrides.update({k: v for k, v in changes.items() if v is not None})
+        os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
+        tmp_file = f"{SETTINGS_FILE}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(overrides, f, indent=2)
+        os.replace(tmp_file, SETTINGS_FILE)
+        current = {**DEFAULT_SETTINGS, **overrides}
+        _settings = current
+        _settings_mtime = _file_mtime()
+        _created_dirs.clear()
+
+    return dict(current)
+
+
+# --- Folder Helpers ---
+def parse_evaluation_date(value) -> date:
+    """None means today; anything else must be a date in one of DATE_FORMATS (ValueError otherwise)."""
+    if value is None:
+        return date.today()
+    if isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    # Filing a note under today's folder would hide it from day lookups and the date export
+    raise ValueError(f"Unrecognized date {value!r}; use MM/DD/YYYY")
+
+
+def day_folder(date_of_evaluation=None) -> str:
+    """e.g. F:/PRC 2025/SEPT-2025/09-06-2025 for an evaluation on 09/06/2025."""
+    day = parse_evaluation_date(date_of_evaluation)
+    return os.path.join(
+        load_settings()["prc_root"],
+        f"PRC {day.year}",
+        f"{MONTH_FOLDERS[day.month - 1]}-{day.year}",
+        day.strftime("%m-%d-%Y"),
+    )
+
+
+def pdf_folder(date_of_evaluation=None) -> str:
+    return ensure_dir(os.path.join(day_folder(date_of_evaluation), "PDF"))
+
+
+def ensure_dir(path: str) -> str:
+    # Only the first request for a folder touches the share
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+    return path
@@ -0,0 +1,143 @@
+import os
+import time
+import sqlite3
+from contextlib import closing, contextmanager
+
+import orjson
+
+# --- Constants ---
+SHARED_DB_FILE = "data/shared.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB,
+    expires_at REAL,
+    PRIMARY KEY (scope, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stream TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_stream ON events (stream, id);
+"""
+
+_schema_ready = False
+
+
+# --- Connection ---
+def _connect():
+    """Per-call connection; WAL lets every uvicorn worker read while one writes."""
+    global _schema_ready
+    os.makedirs(os.path.dirname(SHARED_DB_FILE), exist_ok=True)
+    conn = sqlite3.connect(SHARED_DB_FILE, timeout=5)
+    if not _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _schema_ready = True
+    return conn
+
+
+# --- Key/Value ---
+def get(scope: str, key: str, default=None):
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT value FROM kv WHERE scope = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (scope, key, time.time()),
+        ).fetchone()
+    return orjson.loads(row[0]) if row else default
+
+
+def get_all(scope: str) -> dict:
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT key, value FROM kv WHERE scope = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (scope, time.time()),
+        ).fetchall()
+    return {key: orjson.loads(value) for key, value in rows}
+
+
+def put(scope: str, key: str, value, ttl: float | None = None):
+    expires_at = time.time() + ttl if ttl else None
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (scope, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (scope, key, orjson.dumps(value), expires_at),
+        )
+
+
+def delete(scope: str, key: str):
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM kv WHERE scope = ? AND key = ?", (scope, key))
+
+
+def purge_expired() -> int:
+    with closing(_connect()) as conn, conn:
+        return conn.execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+
+
+# --- Leases (one worker runs a job at a time) ---
+def acquire_lease(name: str, owner: str, ttl: float) -> bool:
+    now = time.time()
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            """
+            INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.expires_at <= ? OR leases.owner = excluded.owner
+            """,
+            (name, owner, now + ttl, now),
+        )
+        row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+    return row is not None and row[0] == owner
+
+
+def release_lease(name: str, owner: str):
+    with closing(_connect()) as conn, conn:
+        conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+# --- Cross-Process Lock (short read-modify-writes of files every worker writes) ---
+@contextmanager
+def exclusive():
+    """Hold the store's write lock; other workers' store writes wait up to the busy timeout."""
+    with closing(_connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        finally:
+            conn.rollback()
+
+
+# --- Event Streams (append-only, readable from any worker or subprocess) ---
+def append_event(stream: str, data) -> int:
+    with closing(_connect()) as conn, conn:
+        return conn.execute(
+            "INSERT INTO events (stream, data, created_at) VALUES (?, ?, ?)",
+            (stream, orjson.dumps(data), time.time()),
+        ).lastrowid
+
+
+def read_events(stream: str, after_id: int = 0) -> list[tuple[int, dict]]:
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT id, data FROM events WHERE stream = ? AND id > ? ORDER BY id", (stream, after_id)
+        ).fetchall()
+    return [(event_id, orjson.loads(data)) for event_id, data in rows]
+
+
+def purge_events(older_than_seconds: float) -> int:
+    with closing(_connect()) as conn, conn:
+        return conn.execute(
+            "DELETE FROM events WHERE created_at <= ?", (time.time() - older_than_seconds,)
+        ).rowcount
@@ -0,0 +1,272 @@
+"""
+Note templates discovered in templates/.
+
+Every `*.docx` there is a template whose id is its slugged file name
+(FU_TEMPLATE_Klickovich.docx -> fu-template-klickovich). templates/registry.json
+names the default, maps physicians and the portal's provider label to a
+template, and lists under "exclude" the reference documents kept next to the
+templates that have no placeholders to fill. Onboarding a provider is a file
+drop plus a manifest edit. A background watcher rescans on change; requests
+only do dictionary lookups.
+
+Each template's Jinja variables are extracted once per file version, so a payload
+can be checked against its template with set operations before anything renders.
+"""
+import io
+import os
+import re
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import settings
+import template_slim
+from app_logging import error_text, log_event
+from payload_models import BACKEND_FIELDS
+
+# --- Constants ---
+TEMPLATES_DIR = "templates"
+MANIFEST_FILE = os.path.join(TEMPLATES_DIR, "registry.json")
+FALLBACK_TEMPLATE_ID = "fu-template-klickovich"
+MAX_COMPILED = 8
+POLL_SECONDS = 2.0
+
+_lock = threading.Lock()
+_templates = {}
+_default_id = FALLBACK_TEMPLATE_ID
+_snapshot = None
+_compiled = OrderedDict()
+_variables = {}
+_stop = threading.Event()
+_thread = None
+
+
+class UnknownTemplate(KeyError):
+    pass
+
+
+def template_id_for(file_name: str) -> str:
+    stem = os.path.splitext(file_name)[0]
+    return re.sub(r"[^a-z0-9]+", "-", stem.lower()).strip("-")
+
+
+# --- Discovery ---
+def _take_snapshot() -> dict:
+    snapshot = {}
+    if os.path.isdir(TEMPLATES_DIR):
+        for entry in os.scandir(TEMPLATES_DIR):
+            if entry.is_file() and (entry.name.endswith(".docx") or entry.path == MANIFEST_FILE):
+                if not entry.name.startswith("~$"):
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+
+def _load_manifest() -> dict:
+    try:
+        with open(MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        log_event("templates.manifest_invalid", level=logging.WARNING, error=str(e))
+        return {}
+
+
+def scan():
+    """Rebuild the registry from disk and drop compiled copies of changed templates."""
+    global _templates, _default_id, _snapshot
+    snapshot = _take_snapshot()
+    manifest = _load_manifest()
+    configured = manifest.get("templates", {})
+    excluded = set(manifest.get("exclude", []))
+
+    templates = {}
+    for path, version in sorted(snapshot.items()):
+        if path == MANIFEST_FILE:
+            continue
+        template_id = template_id_for(os.path.basename(path))
+        if template_id in excluded:
+            continue
+        meta = configured.get(template_id, {})
+        templates[template_id] = {
+            "id": template_id,
+            "path": path,
+            "name": meta.get("name", os.path.splitext(os.path.basename(path))[0]),
+            "physicians": meta.get("physicians", []),
+            "portalProvider": meta.get("portalProvider"),
+            "version": version,
+        }
+
+    with _lock:
+        changed = _snapshot is not None and snapshot != _snapshot
+        _templates = templates
+        _default_id = manifest.get("default", FALLBACK_TEMPLATE_ID)
+        _snapshot = snapshot
+        for key in [k for k in _compiled if k[0] not in templates or templates[k[0]]["version"] != k[1]]:
+            del _compiled[key]
+        for key in [k for k in _variables if k[0] not in templates or templates[k[0]]["version"] != k[1]]:
+            del _variables[key]
+
+    if changed:
+        log_event("templates.reloaded", templates=sorted(templates))
+
+
+def _ensure_scanned():
+    if _snapshot is None:
+        scan()
+
+
+# --- Lookups ---
+def templates() -> list[dict]:
+    _ensure_scanned()
+    with _lock:
+        return [
+            {k: v for k, v in t.items() if k != "version"} | {"default": t["id"] == _default_id}
+            for t in _templates.values()
+        ]
+
+
+def get(template_id: str | None = None) -> dict:
+    _ensure_scanned()
+    with _lock:
+        template_id = template_id or _default_id
+        if template_id not in _templates:
+            raise UnknownTemplate(template_id)
+        return dict(_templates[template_id])
+
+
+def resolve(template_id: str = "", physician: str = "") -> dict:
+    """Explicit templateId first, then the physician mapping, then the default."""
+    if template_id:
+        return get(template_id)
+    if physician:
+        wanted = physician.strip().casefold()
+        _ensure_scanned()
+        with _lock:
+            for template in _templates.values():
+                if any(name.casefold() == wanted for name in template["physicians"]):
+                    return dict(template)
+    return get()
+
+
+def portal_provider(template_id: str | None = None) -> str | None:
+    try:
+        return get(template_id)["portalProvider"]
+    except UnknownTemplate:
+        return None
+
+
+def source(template: dict) -> bytes:
+    """Template bytes (slimmed when enabled), kept in a small LRU keyed by file version."""
+    slim = bool(settings.load_settings().get("slim_template"))
+    key = (template["id"], template["version"], slim)
+    with _lock:
+        data = _compiled.get(key)
+        if data is not None:
+            _compiled.move_to_end(key)
+            return data
+
+    if slim:
+        data = template_slim.slimmed_template(template["path"])
+    else:
+        with open(template["path"], "rb") as f:
+            data = f.read()
+
+    with _lock:
+        _compiled[key] = data
+        while len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return data
+
+
+# --- Variables ---
+def cached_variables(template: dict) -> frozenset | None:
+    with _lock:
+        return _variables.get((template["id"], template["version"]))
+
+
+def variables(template: dict) -> frozenset:
+    """Names the template reads (body, headers and footers), extracted once per file version."""
+    found = cached_variables(template)
+    if found is not None:
+        return found
+
+    from docxtpl import DocxTemplate
+
+    # docxtpl patches the XML (tags split across runs, {%p %} etc.) before asking Jinja
+    found = frozenset(DocxTemplate(io.BytesIO(source(template))).get_undeclared_template_variables())
+    with _lock:
+        _variables[(template["id"], template["version"])] = found
+    log_event("templates.variables_extracted", template=template["id"], variables=len(found))
+    if not found:
+        # Every payload would be "unused" against it; it belongs under "exclude" in the manifest
+        log_event("templates.no_variables", level=logging.WARNING, template=template["id"])
+    return found
+
+
+def _has_value(value) -> bool:
+    if isinstance(value, dict):
+        return any(_has_value(v) for v in value.values())
+    return value not in (None, "", [], {})
+
+
+def mismatch(template_variables: frozenset, data: dict, provided) -> dict | None:
+    """
+    What a render of `data` would get wrong, or None: placeholders nothing fills
+    ("missing") and filled-in fields the template never prints ("unused").
+    `provided` are the keys the client sent: a placeholder left out would render as a blank
+    line even when the payload model has a default for it.
+    """
+    missing = template_variables - provided
+    unused = [
+        name for name, value in data.items()
+        if name not in template_variables and name not in BACKEND_FIELDS and _has_value(value)
+    ]
+    if not missing and not unused:
+        return None
+    return {"missing": sorted(missing), "unused": sorted(unused)}
+
+
+# --- Watcher ---
+def _extract_all():
+    # Off the request path, so the first note after a template edit doesn't pay for extraction
+    for template in list(_templates.values()):
+        try:
+            variables(template)
+        except Exception as e:
+            log_event("templates.variables_failed", level=logging.WARNING, template=template["id"], error=error_text(e))
+
+
+def _watch():
+    try:
+        from watchfiles import watch
+    except ImportError:
+        watch = None
+
+    if watch is not None:
+        for _changes in watch(TEMPLATES_DIR, stop_event=_stop):
+            scan()
+            _extract_all()
+        return
+
+    # No watchfiles: one directory listing every few seconds, off the request path
+    while not _stop.wait(POLL_SECONDS):
+        if _take_snapshot() != _snapshot:
+            scan()
+            _extract_all()
+
+
+def start():
+    global _thread
+    scan()
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_watch, name="template-watcher", daemon=True)
+    _thread.start()
+
+
+def stop():
+    _stop.set()
@@ -0,0 +1,215 @@
+import io
+import os
+import zipfile
+import logging
+
+from lxml import etree
+
+from app_logging import error_text, log_event
+
+# --- Constants ---
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+RSID_ATTRS = {
+    f"{{{W_NS}}}{name}"
+    for name in ("rsidR", "rsidRPr", "rsidRDefault", "rsidP", "rsidDel", "rsidSect", "rsidTr")
+}
+STYLE_REF_TAGS = ("pStyle", "rStyle", "tblStyle", "numStyleLink", "styleLink")
+STYLE_CHAIN_TAGS = ("basedOn", "link", "next")
+WEBEXTENSION_PREFIX = "word/webextensions/"
+
+_cache = {}
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def _parse(data: bytes):
+    return etree.fromstring(data)
+
+
+def _serialize(root) -> bytes:
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+# --- Slimming Passes ---
+def _strip_webextensions(parts: dict):
+    for name in [n for n in parts if n.startswith(WEBEXTENSION_PREFIX)]:
+        del parts[name]
+
+    for name in [n for n in parts if n.endswith(".rels")]:
+        root = _parse(parts[name])
+        removed = False
+        for rel in root.findall(f"{{{REL_NS}}}Relationship"):
+            if "webextension" in rel.get("Type", "").lower():
+                root.remove(rel)
+                removed = True
+        if removed:
+            parts[name] = _serialize(root)
+
+    root = _parse(parts["[Content_Types].xml"])
+    for override in root.findall(f"{{{CT_NS}}}Override"):
+        if override.get("PartName", "").lstrip("/").startswith(WEBEXTENSION_PREFIX):
+            root.remove(override)
+    parts["[Content_Types].xml"] = _serialize(root)
+
+
+def _strip_rsids(parts: dict):
+    if "word/settings.xml" in parts:
+        root = _parse(parts["word/settings.xml"])
+        for rsids in root.findall(_w("rsids")):
+            root.remove(rsids)
+        parts["word/settings.xml"] = _serialize(root)
+
+    for name, data in list(parts.items()):
+        if not name.startswith("word/") or not name.endswith(".xml") or b"w:rsid" not in data:
+            continue
+        root = _parse(data)
+        for el in root.iter():
+            for attr in RSID_ATTRS.intersection(el.attrib):
+                del el.attrib[attr]
+        parts[name] = _serialize(root)
+
+
+def _strip_unused_web_divs(parts: dict):
+    if "word/webSettings.xml" not in parts:
+        return
+
+    referenced = set()
+    for name, data in parts.items():
+        if name.startswith("word/") and b"w:divId" in data:
+            referenced.update(el.get(_w("val")) for el in _parse(data).iter(_w("divId")))
+
+    root = _parse(parts["word/webSettings.xml"])
+    for divs in root.findall(_w("divs")):
+        for div in divs.findall(_w("div")):
+            if div.get(_w("id")) not in referenced:
+                divs.remove(div)
+        if len(divs) == 0:
+            root.remove(divs)
+    parts["word/webSettings.xml"] = _serialize(root)
+
+
+def _strip_unused_styles(parts: dict):
+    if "word/styles.xml" not in parts:
+        return
+
+    referenced = set()
+    for name, data in parts.items():
+        if not name.startswith("word/") or not name.endswith(".xml") or name == "word/styles.xml":
+            continue
+        for el in _parse(data).iter(*[_w(t) for t in STYLE_REF_TAGS]):
+            referenced.add(el.get(_w("val")))
+
+    root = _parse(parts["word/styles.xml"])
+    styles = {s.get(_w("styleId")): s for s in root.findall(_w("style"))}
+
+    keep = {sid for sid, s in styles.items() if s.get(_w("default")) == "1"} | referenced
+    pending = list(keep)
+    while pending:
+        style = styles.get(pending.pop())
+        if style is None:
+            continue
+        for tag in STYLE_CHAIN_TAGS:
+            for el in style.findall(_w(tag)):
+                sid = el.get(_w("val"))
+                if sid not in keep:
+                    keep.add(sid)
+                    pending.append(sid)
+
+    for sid, style in styles.items():
+        if sid not in keep:
+            root.remove(style)
+    parts["word/styles.xml"] = _serialize(root)
+
+
+def slim_docx(data: bytes) -> bytes:
+    """Return a copy of the DOCX without revision IDs, web extensions or unused styles."""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        order = [info.filename for info in zf.infolist()]
+        parts = {name: zf.read(name) for name in order}
+
+    _strip_webextensions(parts)
+    _strip_rsids(parts)
+    _strip_unused_web_divs(parts)
+    _strip_unused_styles(parts)
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in order:
+            if name in parts:
+                zf.writestr(name, parts[name])
+    return out.getvalue()
+
+
+# --- Verification ---
+class _Probe(str):
+    """Placeholder value that also answers attribute lookups (e.g. signature.signatureLine)."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return _Probe(f"{self}.{name}")
+
+
+def _rendered_fingerprint(data: bytes):
+    from docx import Document
+    from docxtpl import DocxTemplate
+
+    doc = DocxTemplate(io.BytesIO(data))
+    context = {name: _Probe(f"[{name}]") for name in doc.get_undeclared_template_variables()}
+    doc.render(context)
+    out = io.BytesIO()
+    doc.save(out)
+
+    rendered = Document(io.BytesIO(out.getvalue()))
+    paragraphs = list(rendered.paragraphs)
+    for table in rendered.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                paragraphs.extend(cell.paragraphs)
+    for section in rendered.sections:
+        for part in (section.header, section.footer, section.first_page_header,
+                     section.first_page_footer, section.even_page_header, section.even_page_footer):
+            paragraphs.extend(part.paragraphs)
+
+    return [
+        (p.style.name if p.style is not None else None, p.text,
+         [(r.bold, r.italic, r.underline, r.font.size, r.font.name) for r in p.runs])
+        for p in paragraphs
+    ]
+
+
+def slimmed_template(template_path: str) -> bytes:
+    """
+    Load-time slimming, cached per template (path, mtime, size).
+
+    The slimmed template is only used if a probe render of it matches a probe
+    render of the original; otherwise the original bytes are returned.
+    """
+    stat = os.stat(template_path)
+    key = (template_path, stat.st_mtime_ns, stat.st_size)
+    if key in _cache:
+        return _cache[key]
+
+    with open(template_path, "rb") as f:
+        original = f.read()
+
+    try:
+        slimmed = slim_docx(original)
+        if _rendered_fingerprint(slimmed) != _rendered_fingerprint(original):
+            log_event("template.slim_mismatch", level=logging.WARNING, template=template_path)
+            slimmed = original
+        else:
+            log_event("template.slimmed", template=template_path, original_bytes=len(original), slimmed_bytes=len(slimmed))
+    except Exception as e:
+        log_event("template.slim_failed", level=logging.WARNING, template=template_path, error=error_text(e))
+        slimmed = original
+
+    for stale in [k for k in _cache if k[0] == template_path]:
+        del _cache[stale]
+    _cache[key] = slimmed
+    return slimmed
@@ -0,0 +1,11 @@
+import pytest
+
+import notes_index
+
+
+@pytest.fixture
+def notes_db(tmp_path, monkeypatch):
+    """A fresh notes index in tmp_path."""
+    monkeypatch.setattr(notes_index, "NOTES_DB_FILE", str(tmp_path / "data" / "notes.db"))
+    monkeypatch.setattr(notes_index, "_schema_ready", False)
+    return notes_index
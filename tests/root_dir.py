@@ -0,0 +1,12 @@
+"""
+pytest plugin (see pytest.ini): the repository root holds a uvicorn launcher named
+__init__.py, so pytest would collect the root as a package and import it. The
+root is collected as a plain directory of modules instead.
+"""
+import pytest
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collect_directory(path, parent):
+    if path == parent.config.rootpath:
+        return pytest.Dir.from_parent(parent, path=path)
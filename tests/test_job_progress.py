@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+import pytest
+
+import job_progress
+import shared_store
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_store, "SHARED_DB_FILE", str(tmp_path / "shared.db"))
+    monkeypatch.setattr(shared_store, "_schema_ready", False)
+    monkeypatch.setattr(job_progress, "POLL_SECONDS", 0.01)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_events_are_only_visible_to_the_session_that_started_the_job():
+    job_id = "client-chosen-id"
+    job_progress.emit(job_progress.job_key("session:a", job_id), "upload.queued", fileName="Doe John")
+
+    assert [e["stage"] for e in job_progress.events(job_progress.job_key("session:a", job_id))] == ["upload.queued"]
+    assert job_progress.events(job_progress.job_key("session:b", job_id)) == []
+
+
+def test_a_stream_ends_after_its_final_stage():
+    job = job_progress.job_key("session:a", "finished-job")
+    job_progress.emit(job, "generate.queued")
+    job_progress.emit(job, "generate.done", noteId=1)
+
+    chunks = asyncio.run(collect(job_progress.sse_stream(job)))
+
+    assert len(chunks) == 2 and b'"generate.done"' in chunks[-1]
+
+
+def test_a_stream_for_a_job_nothing_was_recorded_for_ends_early(monkeypatch):
+    monkeypatch.setattr(job_progress, "PENDING_JOB_SECONDS", 0.2)
+    job_progress.emit(job_progress.job_key("session:a", "someone-elses"), "upload.queued")
+
+    started = time.monotonic()
+    chunks = asyncio.run(collect(job_progress.sse_stream(job_progress.job_key("session:b", "someone-elses"))))
+
+    assert chunks == []
+    assert time.monotonic() - started < job_progress.STREAM_IDLE_SECONDS / 10
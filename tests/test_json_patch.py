@@ -0,0 +1,22 @@
+import pytest
+
+from json_patch import JsonPatchError, apply_patch
+
+
+def test_replace_and_root_replace():
+    doc = {"a": 1, "b": [1, 2]}
+
+    assert apply_patch(doc, [{"op": "replace", "path": "/b/1", "value": 3}]) == {"a": 1, "b": [1, 3]}
+    assert apply_patch(doc, [{"op": "replace", "path": "", "value": {"c": 1}}]) == {"c": 1}
+    assert doc == {"a": 1, "b": [1, 2]}
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "replace", "path": 5, "value": "x"},
+    {"op": "move", "from": 5, "path": "/a"},
+    {"op": "copy", "from": ["a"], "path": "/b"},
+    {"op": "remove", "path": None},
+])
+def test_non_string_pointers_are_patch_errors(operation):
+    with pytest.raises(JsonPatchError):
+        apply_patch({"a": 1, "b": 2}, [operation])
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+
+def _add(notes_index, date_of_evaluation, file_name="Doe John"):
+    return notes_index.add_note(
+        file_name=file_name, patient_name="Doe, John", date_of_evaluation=date_of_evaluation,
+        template_version="v1", docx_path=f"PDF/{file_name}.docx", docx_sha256="0" * 64, docx_size=1,
+    )
+
+
+def test_dates_are_stored_and_queried_as_iso(notes_db):
+    note_id = _add(notes_db, "09/06/2025")
+
+    assert notes_db.get_note(note_id)["date_of_evaluation"] == "2025-09-06"
+    for query in ("2025-09-06", "09/06/2025", "09-06-2025"):
+        assert [n["id"] for n in notes_db.find_notes(date_of_evaluation=query)] == [note_id]
+
+
+def test_unreadable_query_date_is_an_error(notes_db):
+    with pytest.raises(ValueError):
+        notes_db.find_notes(date_of_evaluation="13/45/2025")
+
+
+def test_existing_rows_are_migrated_to_iso(notes_db):
+    note_id = _add(notes_db, "09/06/2025")
+    legacy_id = _add(notes_db, "2025-09-07", file_name="Roe Jane")
+    with sqlite3.connect(notes_db.NOTES_DB_FILE) as conn:
+        conn.execute("UPDATE notes SET date_of_evaluation = '09/07/2025' WHERE id = ?", (legacy_id,))
+        conn.execute("UPDATE notes SET date_of_evaluation = 'someday' WHERE id = ?", (note_id,))
+        conn.execute("DELETE FROM meta WHERE key = 'dates_iso'")
+    notes_db._schema_ready = False
+
+    assert notes_db.get_note(legacy_id)["date_of_evaluation"] == "2025-09-07"
+    # Rows that never parsed are left as they were
+    assert notes_db.get_note(note_id)["date_of_evaluation"] == "someday"
@@ -0,0 +1,66 @@
+import glob
+import io
+import os
+
+import pytest
+from docxtpl import DocxTemplate
+from pypdf import PdfReader
+
+import pdf_render
+from bench_json import follow_up_payload
+from pdf_render import MIN_PARITY, UnsupportedText, parity, render_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TEMPLATE = os.path.join(ROOT, "templates", "FU_TEMPLATE_Klickovich.docx")
+NON_LATIN_NAME = "Nguyễn, Thị Ωmega"
+TEMPLATES = sorted(
+    path for path in glob.glob(os.path.join(ROOT, "templates", "*.docx"))
+    if not os.path.basename(path).startswith("~$")
+)
+
+
+@pytest.fixture
+def payload(monkeypatch):
+    # follow_up_payload reads templates/Template.json relative to the repository root
+    monkeypatch.chdir(ROOT)
+    return follow_up_payload()
+
+
+@pytest.mark.parametrize("template_path", TEMPLATES, ids=os.path.basename)
+def test_direct_pdf_keeps_the_rendered_text(template_path, payload):
+    doc = DocxTemplate(template_path)
+    doc.render(payload)
+    docx = io.BytesIO()
+    doc.save(docx)
+
+    pdf_bytes = render_pdf(doc)
+
+    assert pdf_bytes.startswith(b"%PDF")
+    result = parity(docx.getvalue(), pdf_bytes)
+    assert result["coverage"] >= MIN_PARITY, result["missing"]
+
+
+def _rendered(template_path, payload):
+    doc = DocxTemplate(template_path)
+    doc.render(payload)
+    return doc
+
+
+def test_non_latin_patient_name_is_never_replaced(payload):
+    doc = _rendered(DEFAULT_TEMPLATE, {**payload, "patientName": NON_LATIN_NAME})
+
+    if not pdf_render.unicode_font():
+        with pytest.raises(UnsupportedText):
+            render_pdf(doc)
+        return
+    pdf_bytes = render_pdf(doc)
+    text = "".join(page.extract_text() for page in PdfReader(io.BytesIO(pdf_bytes)).pages)
+    assert f"PATIENT NAME: {NON_LATIN_NAME}" in text
+
+
+def test_core_font_refuses_text_outside_its_encoding(payload, monkeypatch):
+    monkeypatch.setattr(pdf_render, "_font_files", {})
+    doc = _rendered(DEFAULT_TEMPLATE, {**payload, "patientName": NON_LATIN_NAME})
+
+    with pytest.raises(UnsupportedText):
+        render_pdf(doc)
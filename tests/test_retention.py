@@ -0,0 +1,133 @@
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+from docx import Document
+
+import note_archive
+import retention
+import settings
+import shared_store
+
+DAY = 86400
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch, notes_db):
+    """generated/, archive/ and the PRC root all live in tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(settings.DEFAULT_SETTINGS, "prc_root", str(tmp_path / "prc"))
+    monkeypatch.setattr(settings, "_settings", None)
+    monkeypatch.setattr(shared_store, "SHARED_DB_FILE", str(tmp_path / "data" / "shared.db"))
+    monkeypatch.setattr(shared_store, "_schema_ready", False)
+    # The index has existed for a year unless a test says otherwise
+    notes_db.set_meta("tracked_since", str(time.time() - 365 * DAY))
+    return tmp_path
+
+
+def use_policy(monkeypatch, **rules):
+    monkeypatch.setattr(retention, "policy", lambda: {**settings.DEFAULT_SETTINGS["retention"], **rules})
+
+
+def write_file(folder, name, age_days, docx=False):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    if docx:
+        Document().save(path)
+    else:
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 test")
+    mtime = time.time() - age_days * DAY
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def day_pdf_folder(age_days):
+    return os.path.join(settings.day_folder(date.today() - timedelta(days=age_days)), "PDF")
+
+
+def index(notes_db, docx_path, pdf_path=None):
+    return notes_db.add_note("Doe John", "Doe John", "09/06/2025", "v1",
+                             docx_path, "0" * 64, 1, pdf_path=pdf_path)
+
+
+def test_orphans_are_kept_until_a_backfill_is_recorded(monkeypatch, notes_db):
+    use_policy(monkeypatch, delete_orphans=True)
+    orphan = write_file("generated", "Doe John.pdf", age_days=10)
+
+    report = retention.run_once()
+
+    assert os.path.exists(orphan)
+    assert report["deleted_orphans"] == 0
+
+    notes_db.set_meta("backfilled_at", str(time.time()))
+    report = retention.run_once()
+
+    assert not os.path.exists(orphan)
+    assert report["deleted_orphans"] == 1
+
+
+def test_files_older_than_the_index_are_never_orphans(monkeypatch, notes_db):
+    use_policy(monkeypatch, delete_orphans=True)
+    notes_db.set_meta("backfilled_at", str(time.time()))
+    notes_db.set_meta("tracked_since", str(time.time() - 5 * DAY))
+    before_index = write_file("generated", "Doe John.pdf", age_days=10)
+
+    report = retention.run_once()
+
+    assert os.path.exists(before_index)
+    assert report["deleted_orphans"] == 0
+
+
+def test_upload_copies_are_never_orphans(monkeypatch, notes_db):
+    use_policy(monkeypatch, delete_orphans=True)
+    notes_db.set_meta("backfilled_at", str(time.time()))
+    folder = day_pdf_folder(10)
+    orphan = write_file(folder, "Doe John.pdf", age_days=10)
+    copies = [write_file(os.path.join(folder, upload), "Doe John.pdf", age_days=10)
+              for upload in retention.UPLOAD_FOLDERS]
+
+    report = retention.run_once()
+
+    assert not os.path.exists(orphan)
+    assert all(os.path.exists(copy) for copy in copies)
+    assert report["deleted_orphans"] == 1
+
+
+def test_unindexed_expired_files_are_archived_even_without_archiving(monkeypatch):
+    use_policy(monkeypatch, archive=False)
+    expired = write_file("generated", "Doe John.pdf", age_days=40)
+
+    report = retention.run_once()
+
+    assert not os.path.exists(expired)
+    assert report["archived"] == 1 and report["deleted"] == 0
+    with open(note_archive.pdf_path(note_archive.archive_key(expired)), "rb") as f:
+        assert f.read() == b"%PDF-1.4 test"
+
+
+def test_expired_indexed_notes_record_their_archive_names(monkeypatch, notes_db):
+    use_policy(monkeypatch, archive=True)
+    docx_path = write_file("generated", "Doe John.docx", age_days=40, docx=True)
+    pdf_path = write_file(day_pdf_folder(40), "Doe John.pdf", age_days=40)
+    note_id = index(notes_db, docx_path, pdf_path)
+
+    report = retention.run_once()
+
+    assert report["archived"] == 2
+    note = notes_db.get_note(note_id)
+    assert note["docx_path"] is None and note["pdf_path"] is None
+    assert note["docx_archive"] == note_archive.archive_key(docx_path)
+    assert note["pdf_archive"] == note_archive.archive_key(pdf_path)
+    assert os.path.exists(note_archive.pdf_path(note["pdf_archive"]))
+    assert note_archive.load_manifest(note["docx_archive"])["members"]
+
+
+def test_an_archive_from_the_old_location_is_moved_under_data():
+    legacy = write_file(os.path.join(note_archive.LEGACY_ARCHIVE_DIR, "pdf", "generated"), "Doe John.pdf", age_days=40)
+
+    note_archive.move_legacy_archive()
+
+    assert not os.path.exists(legacy)
+    assert os.path.exists(note_archive.pdf_path("generated/Doe John"))
@@ -0,0 +1,20 @@
+from datetime import date
+
+import pytest
+
+from settings import parse_evaluation_date
+
+
+@pytest.mark.parametrize("value", ["09/06/2025", "2025-09-06", "09-06-2025", "9/6/25", " 09/06/2025 "])
+def test_known_formats(value):
+    assert parse_evaluation_date(value) == date(2025, 9, 6)
+
+
+def test_none_means_today():
+    assert parse_evaluation_date(None) == date.today()
+
+
+@pytest.mark.parametrize("value", ["13/45/2025", "", "next tuesday"])
+def test_unreadable_dates_are_errors_not_today(value):
+    with pytest.raises(ValueError):
+        parse_evaluation_date(value)
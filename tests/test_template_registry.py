@@ -0,0 +1,50 @@
+import pytest
+
+import template_registry
+from template_registry import mismatch
+
+
+def test_placeholders_the_client_left_out_are_missing_even_with_a_model_default():
+    data = {"patientName": "Doe, John", "dateOfEvaluation": "09/06/2025", "gait": "", "vitals": ""}
+
+    problems = mismatch(frozenset({"patientName", "gait", "vitals"}), data, {"patientName", "dateOfEvaluation", "gait"})
+
+    assert problems == {"missing": ["vitals"], "unused": []}
+
+
+def test_filled_fields_the_template_never_prints_are_unused():
+    data = {"patientName": "Doe, John", "dateOfEvaluation": "09/06/2025", "gait": "steady", "vitals": ""}
+
+    problems = mismatch(frozenset({"patientName"}), data, set(data))
+
+    # Backend fields and empty values are never reported
+    assert problems == {"missing": [], "unused": ["gait"]}
+
+
+def test_a_payload_that_fits_has_no_problems():
+    data = {"patientName": "Doe, John", "gait": "steady"}
+
+    assert mismatch(frozenset({"patientName", "gait"}), data, set(data)) is None
+
+
+def test_listed_templates_all_have_placeholders_to_fill():
+    listed = template_registry.templates()
+
+    assert [t["id"] for t in listed] == ["fu-template-klickovich"]
+    assert all(template_registry.variables(template_registry.get(t["id"])) for t in listed)
+
+
+def test_excluded_documents_are_not_templates(tmp_path, monkeypatch):
+    (tmp_path / "Reference.docx").write_bytes(b"")
+    (tmp_path / "Follow Up.docx").write_bytes(b"")
+    (tmp_path / "registry.json").write_text('{"default": "follow-up", "exclude": ["reference"]}')
+    monkeypatch.setattr(template_registry, "TEMPLATES_DIR", str(tmp_path))
+    monkeypatch.setattr(template_registry, "MANIFEST_FILE", str(tmp_path / "registry.json"))
+    # The registry is module state; these restore the real one afterwards
+    for name in ("_snapshot", "_templates", "_default_id"):
+        monkeypatch.setattr(template_registry, name, getattr(template_registry, name))
+    monkeypatch.setattr(template_registry, "_snapshot", None)
+
+    assert [t["id"] for t in template_registry.templates()] == ["follow-up"]
+    with pytest.raises(template_registry.UnknownTemplate):
+        template_registry.get("reference")
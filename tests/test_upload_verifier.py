@@ -0,0 +1,119 @@
+import logging
+import os
+from datetime import date
+
+import pytest
+
+import shared_store
+import upload_verifier
+from upload_verifier import STATUS_CONFIRMED, STATUS_RETRY, parse_document_list, record_upload, verify_batch
+
+PAGE = os.path.join(os.path.dirname(__file__), "fixtures", "patient_documents.html")
+
+
+class FakeDriver:
+    """Serves the document list pages in order, repeating the last one."""
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+        self.loads = 0
+
+    def get(self, url):
+        self.loads += 1
+
+    @property
+    def page_source(self):
+        return self.pages[min(self.loads, len(self.pages)) - 1]
+
+
+@pytest.fixture
+def page():
+    with open(PAGE, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(autouse=True)
+def ledger(tmp_path, monkeypatch, notes_db):
+    monkeypatch.setattr(upload_verifier, "UPLOAD_LEDGER_FILE", str(tmp_path / "upload_ledger.json"))
+    monkeypatch.setattr(shared_store, "SHARED_DB_FILE", str(tmp_path / "shared.db"))
+    monkeypatch.setattr(shared_store, "_schema_ready", False)
+
+
+def test_parse_document_list_normalizes_titles_and_dates(page):
+    documents = parse_document_list(page)
+
+    assert ("pdf upload: doe john 09-06-2025", date(2025, 9, 6)) in documents
+    assert ("pdf upload: roe jane 09-05-2025", date(2025, 9, 6)) in documents
+    assert ("pdf upload: poe edgar 08-30-2025", date(2025, 8, 30)) in documents
+    # Header cells and cells without a date in the row are never documents
+    assert not any(title == "title" for title, _ in documents)
+
+
+def test_verify_batch_marks_listed_uploads_confirmed_and_the_rest_retry(page):
+    listed = record_upload("PDF Upload: Doe John 09-06-2025", "PDF/Doe John 09-06-2025.pdf", date="09/06/2025")
+    wrong_day = record_upload("PDF Upload: Poe Edgar 08-30-2025", "PDF/Poe Edgar 08-30-2025.pdf", date="09/06/2025")
+    absent = record_upload("PDF Upload: Moe Ann 09-06-2025", "PDF/Moe Ann 09-06-2025.pdf", date="09/06/2025")
+
+    missing = verify_batch(FakeDriver(page), [listed, wrong_day, absent])
+
+    assert {e["file_path"] for e in missing} == {wrong_day["file_path"], absent["file_path"]}
+    statuses = {e["file_path"]: e["status"] for e in upload_verifier.load_ledger()}
+    assert statuses == {
+        listed["file_path"]: STATUS_CONFIRMED,
+        wrong_day["file_path"]: STATUS_RETRY,
+        absent["file_path"]: STATUS_RETRY,
+    }
+
+
+def test_verify_batch_polls_until_the_upload_is_listed(page):
+    before = page.replace("PDF Upload: Doe John 09-06-2025", "PDF Upload: Someone Else")
+    entry = record_upload("PDF Upload: Doe John 09-06-2025", "PDF/Doe John 09-06-2025.pdf", date="09/06/2025")
+    driver = FakeDriver(before, before, page)
+
+    missing = verify_batch(driver, [entry], timeout=5, poll_interval=0)
+
+    assert missing == []
+    assert driver.loads == 3
+    assert upload_verifier.load_ledger()[0]["status"] == STATUS_CONFIRMED
+
+
+def test_verify_batch_gives_up_after_the_timeout(page):
+    entry = record_upload("PDF Upload: Moe Ann 09-06-2025", "PDF/Moe Ann 09-06-2025.pdf", date="09/06/2025")
+
+    missing = verify_batch(FakeDriver(page), [entry], timeout=0.05, poll_interval=0.01)
+
+    assert [e["file_path"] for e in missing] == [entry["file_path"]]
+    assert upload_verifier.load_ledger()[0]["status"] == STATUS_RETRY
+
+
+def test_verify_batch_logs_note_ids_instead_of_patient_names(page, notes_db, monkeypatch):
+    path = "PDF/Moe Ann 09-06-2025.pdf"
+    note_id = notes_db.add_note("Moe Ann 09-06-2025", "Moe Ann", "09/06/2025", "v1",
+                                "DOCX/Moe Ann 09-06-2025.docx", "0" * 64, 1, pdf_path=path)
+    events = []
+    monkeypatch.setattr(upload_verifier, "log_event", lambda event, **fields: events.append((event, fields)))
+    entry = record_upload("PDF Upload: Moe Ann 09-06-2025", path, date="09/06/2025")
+
+    verify_batch(FakeDriver(page), [entry])
+
+    assert ("upload.not_on_portal", {"level": logging.WARNING, "note_id": note_id, "date": "09/06/2025"}) in events
+    assert "Moe" not in repr(events)
+
+
+def _record_many(args):
+    ledger, shared_db, worker = args
+    upload_verifier.UPLOAD_LEDGER_FILE = ledger
+    shared_store.SHARED_DB_FILE = shared_db
+    for i in range(20):
+        record_upload(f"PDF Upload: Worker {worker} Note {i}", f"PDF/{worker}-{i}.pdf", date="09/06/2025")
+
+
+def test_concurrent_uploaders_keep_every_ledger_entry(tmp_path):
+    import multiprocessing
+
+    ledger, shared_db = str(tmp_path / "upload_ledger.json"), str(tmp_path / "shared.db")
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.map(_record_many, [(ledger, shared_db, worker) for worker in range(4)])
+
+    upload_verifier.UPLOAD_LEDGER_FILE = ledger
+    assert len(upload_verifier.load_ledger()) == 80
@@ -0,0 +1,98 @@
+import time
+import random
+import threading
+
+import orjson
+
+import async_io
+import settings
+
+# --- Constants ---
+MAX_RECORDED_BODY = 1024 * 1024
+# Dates are identifying too; they are replaced but keep their format so parsing still succeeds
+DATE_FIELDS = {"dateOfEvaluation", "dob", "dateTranscribed"}
+PLACEHOLDER_DATE = "01/01/2000"
+# Pick the template on replay and name no patient, so they are kept as recorded
+ROUTING_FIELDS = {"templateId", "physician"}
+
+_write_lock = threading.Lock()
+
+
+def policy() -> dict:
+    configured = settings.load_settings().get("traffic_recording") or {}
+    return {**settings.DEFAULT_SETTINGS["traffic_recording"], **configured}
+
+
+# --- Anonymization ---
+def _mask(text: str) -> str:
+    # Same length, spacing and line breaks, so replayed renders cost what the originals did
+    return "".join("x" if c.isalpha() else "0" if c.isdigit() else c for c in text)
+
+
+def anonymize(value, key: str | None = None):
+    if isinstance(value, dict):
+        return {k: anonymize(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [anonymize(v) for v in value]
+    if isinstance(value, str) and value and key not in ROUTING_FIELDS:
+        return PLACEHOLDER_DATE if key in DATE_FIELDS else _mask(value)
+    return value
+
+
+def _append(path: str, entry: dict):
+    with _write_lock, open(path, "ab") as f:
+        f.write(orjson.dumps(entry) + b"\n")
+
+
+# --- ASGI Middleware ---
+class TrafficRecorder:
+    """
+    Appends sampled, anonymized requests for the configured routes to a JSONL file
+    that loadtest.py can replay. Off unless `traffic_recording.enabled` is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rules = policy()
+        if not rules["enabled"] or scope["path"] not in rules["routes"] or random.random() >= rules["sample_rate"]:
+            return await self.app(scope, receive, send)
+
+        body = bytearray()
+        status = {"code": 500}
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) <= MAX_RECORDED_BODY:
+                body.extend(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        received_at = time.time()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            entry = {
+                "ts": round(received_at, 3),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "body": None,
+                "status": status["code"],
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+            if body and len(body) <= MAX_RECORDED_BODY:
+                try:
+                    entry["body"] = anonymize(orjson.loads(bytes(body)))
+                except orjson.JSONDecodeError:
+                    pass
+            await async_io.run_io(_append, rules["file"], entry)
@@ -1,5 +1,16 @@
-# Import the PRC_FOLDER and file_name_storage from main.py
-from main import PRC_FOLDER, file_name_storage
+# The last uploaded fileName comes from the shared session store; the PRC folder from settings
+import sys
+import shared_store
+import template_registry
+from settings import day_folder
+
+# Session to read from, e.g. "session:127.0.0.1" (see main.session_scope)
+SESSION_SCOPE = sys.argv[1] if len(sys.argv) > 1 else "session:127.0.0.1"
+
+PRC_FOLDER = day_folder()
+
+# Provider label from templates/registry.json (default template)
+PORTAL_PROVIDER = template_registry.portal_provider() or "KLICKOVICH MD, ROBERT"
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -8,18 +19,18 @@ from selenium.webdriver.support import expected_conditions as EC
 import time
 import os
 
-# Extract the file names from file_name_storage (assuming it's a dictionary)
-file1_name = file_name_storage.get("last_uploaded")  # Get the last uploaded file name
-file2_name = file_name_storage.get("last_uploaded")  # If both files are same, we can use the same for file2
+# Extract the file names from the session store
+file1_name = shared_store.get(SESSION_SCOPE, "last_uploaded")  # Get the last uploaded file name
+file2_name = shared_store.get(SESSION_SCOPE, "last_uploaded")  # If both files are same, we can use the same for file2
 
 # Check if file names are found
 if not file1_name or not file2_name:
-    print("Error: 'file1' or 'file2' names could not be retrieved from file_name_storage.")
+    print("Error: 'file1' or 'file2' names could not be retrieved from the session store.")
     exit()
 
 print(f"Extracted file names: file1 = {file1_name}, file2 = {file2_name}")
 
-# Define the paths dynamically based on PRC_FOLDER from main.py
+# Define the paths dynamically based on the PRC day folder
 path1 = os.path.join(PRC_FOLDER, file1_name)  # Path 1 for file1
 path2 = os.path.join(PRC_FOLDER, "PDF", file2_name)  # Path 2 for file2 (PDF subfolder)
 
@@ -53,11 +64,11 @@ def upload_file(file_path, file_name):
     # Select "consults" option
     Select(doc_type_dropdown).select_by_visible_text("consults")
 
-    # Step 6: Choose "KLICKOVICH MD, ROBERT" from Provider dropdown
+    # Step 6: Choose the provider from the Provider dropdown
     provider_dropdown = wait.until(EC.presence_of_element_located((By.XPATH, "//select[contains(@name, 'provider')]")))
 
-    # Select the provider "KLICKOVICH MD, ROBERT"
-    Select(provider_dropdown).select_by_visible_text("KLICKOVICH MD, ROBERT")
+    # Select the provider, e.g. "KLICKOVICH MD, ROBERT"
+    Select(provider_dropdown).select_by_visible_text(PORTAL_PROVIDER)
 
     # Step 7: Re-enter Document Title in the second input field
     title_inputs = driver.find_elements(By.XPATH, "//input[@type='text']")
@@ -0,0 +1,188 @@
+import os
+import json
+import logging
+import re
+import time
+from datetime import datetime
+from html.parser import HTMLParser
+
+import notes_index
+import shared_store
+from app_logging import log_event
+
+# --- Constants ---
+PATIENT_DOC_URL = "https://txn2.healthfusionclaims.com/electronic/pm/patient_doc.jsp"
+UPLOAD_LEDGER_FILE = "data/upload_ledger.json"
+
+DATE_FORMATS = ("%m/%d/%Y", "%m-%d-%Y", "%Y-%m-%d", "%m/%d/%y")
+DATE_PATTERN = re.compile(r"\d{1,4}[/-]\d{1,2}[/-]\d{2,4}")
+DATE_CELL_PATTERN = re.compile(r"^\d{1,4}[/-]\d{1,2}[/-]\d{2,4}(\s+\d{1,2}:\d{2}.*)?$")
+
+STATUS_SUBMITTED = "submitted"
+STATUS_CONFIRMED = "confirmed"
+STATUS_RETRY = "retry"
+
+# The portal lists an upload a few seconds after its submit
+VERIFY_TIMEOUT_SECONDS = 60
+VERIFY_POLL_SECONDS = 3
+
+
+# --- Ledger Helpers ---
+# Every /upload-documents call runs its own uploader process, so each read-modify-write of the
+# ledger holds the shared store's lock and the file is replaced in one step
+def load_ledger():
+    if not os.path.exists(UPLOAD_LEDGER_FILE):
+        return []
+    with open(UPLOAD_LEDGER_FILE, "r") as f:
+        return json.load(f)
+
+
+def save_ledger(entries):
+    os.makedirs(os.path.dirname(UPLOAD_LEDGER_FILE), exist_ok=True)
+    tmp_file = f"{UPLOAD_LEDGER_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_file, UPLOAD_LEDGER_FILE)
+
+
+def record_upload(title: str, file_path: str, date: str | None = None) -> dict:
+    """Append a submitted upload to the ledger and return the entry."""
+    entry = {
+        "title": title,
+        "file_path": file_path,
+        "date": date or datetime.now().strftime("%m/%d/%Y"),
+        "status": STATUS_SUBMITTED,
+        "attempts": 1,
+    }
+
+    with shared_store.exclusive():
+        entries = load_ledger()
+        for existing in entries:
+            if existing["title"] == title and existing["date"] == entry["date"]:
+                existing["file_path"] = file_path
+                existing["status"] = STATUS_SUBMITTED
+                existing["attempts"] = existing.get("attempts", 0) + 1
+                save_ledger(entries)
+                return existing
+
+        entries.append(entry)
+        save_ledger(entries)
+    return entry
+
+
+def pending_retries():
+    return [e for e in load_ledger() if e["status"] == STATUS_RETRY]
+
+
+# --- Document List Parsing ---
+class _DocumentTableParser(HTMLParser):
+    """Collects the text of every table cell, grouped by row."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            self._row.append(" ".join("".join(self._cell).split()))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if any(self._row):
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(title.split()).casefold()
+
+
+def normalize_date(value: str):
+    match = DATE_PATTERN.search(value or "")
+    if not match:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(match.group(0), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_document_list(html: str):
+    """Return the set of (title, date) pairs listed on the patient document page."""
+    parser = _DocumentTableParser()
+    parser.feed(html)
+
+    documents = set()
+    for row in parser.rows:
+        date_cells = [cell for cell in row if DATE_CELL_PATTERN.match(cell)]
+        dates = {normalize_date(cell) for cell in date_cells} - {None}
+        for cell in row:
+            if not cell or cell in date_cells:
+                continue
+            for date in dates:
+                documents.add((normalize_title(cell), date))
+    return documents
+
+
+def fetch_document_list(driver, url: str = PATIENT_DOC_URL):
+    # One page load and one page_source read for the whole batch
+    driver.get(url)
+    return parse_document_list(driver.page_source)
+
+
+# --- Batch Verification ---
+def verify_batch(driver, batch: list[dict], url: str = PATIENT_DOC_URL,
+                 timeout: float = 0, poll_interval: float = VERIFY_POLL_SECONDS) -> list[dict]:
+    """
+    Confirm a batch of uploads against the portal document list.
+
+    The list is re-read every `poll_interval` seconds until it shows the whole
+    batch or `timeout` runs out. Entries found on the portal are marked
+    confirmed, the rest are marked for retry. Returns the entries that still
+    need to be uploaded.
+    """
+    if not batch:
+        return []
+
+    keys = {(normalize_title(e["title"]), normalize_date(e["date"])) for e in batch}
+
+    documents = fetch_document_list(driver, url)
+    deadline = time.monotonic() + timeout
+    while not keys <= documents and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        documents = fetch_document_list(driver, url)
+
+    missing = []
+    with shared_store.exclusive():
+        entries = load_ledger()
+        for entry in entries:
+            key = (normalize_title(entry["title"]), normalize_date(entry["date"]))
+            if key not in keys:
+                continue
+            if key in documents:
+                entry["status"] = STATUS_CONFIRMED
+            else:
+                entry["status"] = STATUS_RETRY
+                missing.append(entry)
+        save_ledger(entries)
+
+    log_event("upload.verified", confirmed=len(batch) - len(missing), total=len(batch))
+    for entry in missing:
+        # Titles carry the patient name, so the log names the note instead
+        log_event("upload.not_on_portal", level=logging.WARNING,
+                  note_id=notes_index.note_id_for_pdf(entry["file_path"]), date=entry["date"])
+
+    return missing
@@ -0,0 +1,46 @@
+import zipfile
+
+
+class _ChunkBuffer:
+    """Write-only sink for ZipFile; collects output until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(members):
+    """
+    Build a ZIP archive incrementally and yield it as byte chunks.
+
+    `members` is an iterable of (ZipInfo, iterable_of_bytes) pairs. Nothing is
+    buffered beyond the chunk currently being written, so the archive can be
+    streamed straight into a response or a file.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for info, chunks in members:
+            with zf.open(info, "w") as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+
+    data = buffer.drain()
+    if data:
+        yield data